@@ -0,0 +1,44 @@
+import argparse
+import logging
+import time
+
+from config import DEFAULT_RENDER_PROFILE, RENDER_PROFILES
+from src.renderer import ManimRenderer
+
+
+SCENES = {
+    "before (updaters + TracedPath)": "solar.py",
+    "after (src.utils point arrays)": "solar_vectorized.py",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render solar.py before/after the vectorized helpers.")
+    parser.add_argument("--profile", default=DEFAULT_RENDER_PROFILE, choices=list(RENDER_PROFILES))
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = {}
+    for label, script in SCENES.items():
+        timings = []
+        for _ in range(args.repeat):
+            renderer = ManimRenderer(
+                script_path=script,
+                profile=args.profile,
+                media_dir="media/bench",
+                shards=1,
+            )
+            start = time.perf_counter()
+            renderer.render()
+            timings.append(time.perf_counter() - start)
+        results[label] = min(timings)
+
+    baseline = next(iter(results.values()))
+    print(f"Profile: {args.profile}")
+    for label, seconds in results.items():
+        print(f"{label:<34} {seconds:7.2f}s  x{baseline / seconds:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,9 @@
 OUTPUT_DIR = "output"
+OUTPUT_STORE_DIR = "output/store"
+OUTPUT_STORE_MAX_ENTRIES = 50
+PREVIEW_PROXY_ENABLED = True
+PREVIEW_PROXY_HEIGHT = 480
+PREVIEW_PROXY_GOP = 15
 SCENE_NAME = "GenScene"
 QWEN_MODEL = "qwen3-coder-plus"
 QWEN_CLI = r"C:\Users\user\AppData\Roaming\npm\qwen.ps1"
@@ -29,6 +34,96 @@ LLM_COMMANDS = {
 }
 LLM_COMMAND = LLM_COMMANDS.get(LLM_PROVIDER, QWEN_COMMAND)
 MAX_FIX_ATTEMPTS = 0
+RENDER_SHARDS = 1
+RENDER_PROFILES = {
+    "Draft": {
+        "quality": "-ql",
+        "fps": 15,
+        "resolution": "640,360",
+        "renderer": "cairo",
+        "encode": None,
+    },
+    "Low": {"quality": "-ql"},
+    "Medium": {"quality": "-qm"},
+    "High": {"quality": "-qh"},
+    "Final": {
+        "quality": "-qh",
+        "fps": 60,
+        "renderer": "cairo",
+        "encode": {"codec": "libx264", "preset": "slow", "crf": 20, "tune": "animation"},
+    },
+}
+DEFAULT_RENDER_PROFILE = "Medium"
+EXPORT_DEFAULT_FORMATS = ["gif", "webm", "apng", "poster", "social"]
+EXPORT_SETTINGS = {
+    "gif": {"fps": 15, "width": 640},
+    "webm": {"crf": 32, "cpu_used": 4},
+    "apng": {"fps": 15, "width": 480},
+    "poster": {"time": 0.0},
+    "social": {"height": 720, "crf": 23, "preset": "medium"},
+}
+SERVER_ADDRESS = "127.0.0.1:8780"
+SERVER_JOBS_DIR = "output/jobs"
+SERVER_WORKERS = 2
+SERVER_EVENT_HISTORY = 2000
+SERVER_MAX_FINISHED_JOBS = 200
+SERVER_MAX_ATTEMPTS = 3
+RENDER_COORDINATOR = None
+COORDINATOR_ADDRESS = "127.0.0.1:8765"
+COORDINATOR_RESULT_DIR = "media/coordinator"
+COORDINATOR_HEARTBEAT_SECONDS = 2.0
+COORDINATOR_WORKER_TIMEOUT = 10.0
+COORDINATOR_MAX_RETRIES = 2
+COORDINATOR_STEAL_AFTER = 60.0
+COORDINATOR_SECRET = None
+COORDINATOR_JOB_TTL = 600.0
+TEXT_CACHE_DIR = "cache/text"
+TEXT_CACHE_MAX_MB = 256
+TEXT_CACHE_PREWARM_FONT_SIZES = [24, 36, 48]
+TEXT_CACHE_PREWARM_LABELS = (
+    [str(number) for number in range(0, 11)]
+    + ["x", "y", "z", "t", "f(x)", "Time", "Value", "Distance", "Speed", "Velocity"]
+    + ["Step 1", "Step 2", "Step 3", "Start", "End", "Result", "Sun", "Earth", "Moon"]
+)
+EXAMPLES_INDEX_PATH = "cache/examples/index.json"
+EXAMPLES_MAX_ENTRIES = 200
+EXAMPLES_TOP_K = 2
+EXAMPLES_MAX_CHARS = 6000
+OPTIMIZER_PASSES = {
+    "hoist_updater_constants": True,
+    "static_always_redraw": True,
+    "merge_adds": True,
+    "collapse_waits": True,
+    "merge_waits": False,
+}
+WATCH_POLL_SECONDS = 0.5
+WATCH_DEBOUNCE_SECONDS = 0.8
+WATCH_RENDER_PROFILE = "Draft"
+RENDER_STATIC_FRAMES = True
+RENDER_PROFILING = False
+PROFILING_DIR = "output/profiles"
+PROFILING_SAMPLER = "cprofile"
+PROFILING_TOP_N = 15
+RENDER_LIMITS = {
+    "memory_mb": 4096,
+    "cpu_seconds": 1800,
+    "file_size_mb": 2048,
+    "max_frames": 36000,
+}
+RENDER_MAX_CONCURRENCY = None
+RENDER_JOB_MEMORY_MB = 1536
+RENDER_BUDGET_SECONDS = 180
+RENDER_BUDGET_ACTION = "warn"
+RENDER_COST_MODEL = {
+    "startup": 3.0,
+    "frame": 0.004,
+    "megapixel": 0.012,
+    "object": 0.03,
+    "updater": 0.0015,
+    "traced_path_point": 0.00002,
+    "text": 0.25,
+    "encode_megapixel": 0.003,
+}
 SYSTEM_PROMPT = (
     "You are a Python expert specializing in the Manim Community library.\n"
     "Your goal is to write a COMPLETE, RUNNABLE Python script for an animation.\n"
@@ -47,6 +142,15 @@ SYSTEM_PROMPT = (
     "1. Always use `self.wait(1)` after significant animations so the viewer can see the result.\n"
     "2. Ensure objects do not overlap unintentionally.\n"
     "\n"
+    "### PERFORMANCE:\n"
+    "1. Per-frame `add_updater` lambdas, `always_redraw` and `TracedPath` are slow. Avoid them for motion.\n"
+    "2. Instead, add `from src.utils import *` and precompute motion with NumPy:\n"
+    "   `orbit_points(center, radius, turns, phase, samples)`, `parametric_points(func, t_range, samples)`\n"
+    "   (func receives an array of t values) and `relative_points(base_points, offset_points)`.\n"
+    "3. Animate along those arrays with `FollowPoints(mobject, points, run_time=...)`, draw trails with\n"
+    "   `trail_from_points(points, stroke_color=...)`, or use `follow_with_trail(mobject, points, run_time=..., **style)`.\n"
+    "4. Use the same `samples` count for arrays that are combined with `relative_points`.\n"
+    "\n"
     "### OUTPUT FORMAT:\n"
     "1. Return valid Python code inside markdown blocks (```python ... ```).\n"
     "2. Do not include external explanations outside the code block.\n"
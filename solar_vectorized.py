@@ -0,0 +1,27 @@
+from manim import *
+import numpy as np
+
+from src.utils import follow_with_trail, orbit_points, relative_points
+
+class GenScene(Scene):
+    def construct(self):
+        # Same scene as solar.py, driven by precomputed point arrays
+        # instead of per-frame updater lambdas and TracedPath.
+        sun = Dot(radius=0.4, color=YELLOW)
+        earth = Dot(radius=0.15, color=BLUE)
+        moon = Dot(radius=0.08, color=GREY)
+
+        samples = 1201
+        earth_path = orbit_points(radius=3, turns=1, samples=samples)
+        moon_path = relative_points(earth_path, orbit_points(radius=0.8, turns=12, samples=samples))
+
+        earth.move_to(earth_path[0])
+        moon.move_to(moon_path[0])
+        self.add(sun, earth, moon)
+
+        self.play(
+            follow_with_trail(earth, earth_path, run_time=10, stroke_color=BLUE_E, stroke_width=2),
+            follow_with_trail(moon, moon_path, run_time=10, stroke_color=WHITE, stroke_width=1),
+        )
+
+        self.wait(1)
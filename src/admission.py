@@ -0,0 +1,95 @@
+import itertools
+import logging
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from config import RENDER_JOB_MEMORY_MB, RENDER_MAX_CONCURRENCY
+
+
+logger = logging.getLogger(__name__)
+
+
+def available_memory_bytes():
+    try:
+        with open("/proc/meminfo", encoding="utf-8") as handle:
+            for line in handle:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.virtual_memory().available
+
+
+def compute_capacity(job_memory_mb=RENDER_JOB_MEMORY_MB, max_jobs=RENDER_MAX_CONCURRENCY):
+    if max_jobs:
+        return max(1, int(max_jobs))
+    capacity = os.cpu_count() or 1
+    memory = available_memory_bytes()
+    if memory and job_memory_mb:
+        capacity = min(capacity, memory // (job_memory_mb * 1024 * 1024))
+    return max(1, int(capacity))
+
+
+class AdmissionController:
+    def __init__(self, capacity=None):
+        self.capacity = capacity or compute_capacity()
+        self.active = 0
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._tickets = itertools.count()
+
+    @property
+    def queued(self):
+        with self._cond:
+            return len(self._queue)
+
+    def acquire(self, slots=1):
+        slots = max(1, min(int(slots), self.capacity))
+        with self._cond:
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+            if self._queue[0] != ticket or self.active + slots > self.capacity:
+                logger.info(
+                    "Render queued: %d/%d slots busy, %d waiting",
+                    self.active,
+                    self.capacity,
+                    len(self._queue) - 1,
+                )
+            while self._queue[0] != ticket or self.active + slots > self.capacity:
+                self._cond.wait()
+            self._queue.popleft()
+            self.active += slots
+            self._cond.notify_all()
+        return slots
+
+    def release(self, slots=1):
+        with self._cond:
+            self.active = max(0, self.active - slots)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, slots=1):
+        granted = self.acquire(slots)
+        try:
+            yield granted
+        finally:
+            self.release(granted)
+
+
+_shared_controller = None
+_shared_lock = threading.Lock()
+
+
+def shared_admission():
+    global _shared_controller
+    with _shared_lock:
+        if _shared_controller is None:
+            _shared_controller = AdmissionController()
+            logger.info("Render admission capacity: %d concurrent manim processes", _shared_controller.capacity)
+        return _shared_controller
@@ -0,0 +1,285 @@
+import ast
+import logging
+
+from config import SCENE_NAME
+
+
+logger = logging.getLogger(__name__)
+
+ANIMATION_METHODS = ("play", "wait", "pause", "wait_until")
+ANIMATION_CLASSES = {
+    "AddTextLetterByLetter",
+    "AnimationGroup",
+    "ApplyMethod",
+    "Broadcast",
+    "Circumscribe",
+    "Create",
+    "DrawBorderThenFill",
+    "FadeIn",
+    "FadeOut",
+    "FadeTransform",
+    "Flash",
+    "FollowPoints",
+    "GrowArrow",
+    "GrowFromCenter",
+    "GrowFromPoint",
+    "Indicate",
+    "LaggedStart",
+    "MoveAlongPath",
+    "ReplacementTransform",
+    "Rotate",
+    "Rotating",
+    "ShowPassingFlash",
+    "SpinInFromNothing",
+    "Succession",
+    "Transform",
+    "TransformMatchingShapes",
+    "Uncreate",
+    "Unwrite",
+    "ValueTracker",
+    "Wiggle",
+    "Write",
+}
+TEXT_CLASSES = {"Text", "MarkupText", "Paragraph", "Code"}
+UPDATER_CALLS = {"add_updater", "always_redraw", "f_always", "always"}
+
+
+def parse_script(source):
+    try:
+        return ast.parse(source)
+    except SyntaxError as exc:
+        logger.warning("Script is not valid Python: %s", exc)
+        return None
+
+
+def find_construct(tree, scene_name=SCENE_NAME):
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == scene_name:
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef) and item.name == "construct":
+                    return item
+    return None
+
+
+def is_animation_call(node):
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr in ANIMATION_METHODS
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "self"
+    )
+
+
+def animation_statements(source, scene_name=SCENE_NAME):
+    # None means the animation sequence is not static (loops, branches, helpers).
+    tree = parse_script(source)
+    if tree is None:
+        return None
+    construct = find_construct(tree, scene_name)
+    if construct is None:
+        return None
+
+    statements = [
+        stmt
+        for stmt in construct.body
+        if isinstance(stmt, ast.Expr) and is_animation_call(stmt.value)
+    ]
+    total = sum(1 for node in ast.walk(tree) if is_animation_call(node))
+    if total != len(statements):
+        return None
+    return statements
+
+
+def count_animations(source, scene_name=SCENE_NAME):
+    statements = animation_statements(source, scene_name)
+    if statements is None:
+        return None
+    return len(statements)
+
+
+def constant_number(node, default=None):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return float(node.value)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = constant_number(node.operand)
+        return -value if value is not None else default
+    return default
+
+
+def call_duration(call):
+    method = call.func.attr
+    if method == "play":
+        for keyword in call.keywords:
+            if keyword.arg == "run_time":
+                return constant_number(keyword.value, 1.0)
+        # Without its own run_time, play lasts as long as the longest
+        # animation passed to it, e.g. Create(x, run_time=30) or a nested
+        # AnimationGroup/follow_with_trail(..., run_time=60).
+        run_times = [
+            constant_number(keyword.value)
+            for arg in call.args
+            for node in ast.walk(arg)
+            if isinstance(node, ast.Call)
+            for keyword in node.keywords
+            if keyword.arg == "run_time"
+        ]
+        return max([value for value in run_times if value is not None], default=1.0)
+
+    duration = None
+    if call.args:
+        duration = constant_number(call.args[0])
+    for keyword in call.keywords:
+        if keyword.arg in ("duration", "max_time"):
+            duration = constant_number(keyword.value)
+    return 1.0 if duration is None else duration
+
+
+def animation_durations(source, scene_name=SCENE_NAME):
+    statements = animation_statements(source, scene_name)
+    if statements is None:
+        return None
+    return [call_duration(stmt.value) for stmt in statements]
+
+
+class RenderCost:
+    def __init__(self, duration=0.0, updaters=0, traced_paths=0, objects=0, texts=0):
+        self.duration = duration
+        self.updaters = updaters
+        self.traced_paths = traced_paths
+        self.objects = objects
+        self.texts = texts
+
+    def frames(self, fps):
+        return int(round(self.duration * fps))
+
+    def add(self, other, times=1):
+        self.duration += other.duration * times
+        self.updaters += other.updaters * times
+        self.traced_paths += other.traced_paths * times
+        self.objects += other.objects * times
+        self.texts += other.texts * times
+
+    def __repr__(self):
+        return (
+            f"RenderCost(duration={self.duration:.1f}s, updaters={self.updaters}, "
+            f"traced_paths={self.traced_paths}, objects={self.objects}, texts={self.texts})"
+        )
+
+
+def estimate_cost(source, scene_name=SCENE_NAME):
+    tree = parse_script(source)
+    if tree is None:
+        return None
+    construct = find_construct(tree, scene_name)
+    if construct is None:
+        return None
+    return _block_cost(construct.body)
+
+
+def _block_cost(statements):
+    cost = RenderCost()
+    for stmt in statements:
+        cost.add(_statement_cost(stmt))
+    return cost
+
+
+def _statement_cost(stmt):
+    if isinstance(stmt, (ast.For, ast.AsyncFor)):
+        cost = _expression_cost(stmt.iter)
+        cost.add(_block_cost(stmt.body), _loop_count(stmt.iter))
+        cost.add(_block_cost(stmt.orelse))
+        return cost
+    if isinstance(stmt, ast.While):
+        cost = _expression_cost(stmt.test)
+        cost.add(_block_cost(stmt.body))
+        return cost
+    if isinstance(stmt, ast.If):
+        cost = _expression_cost(stmt.test)
+        body = _block_cost(stmt.body)
+        orelse = _block_cost(stmt.orelse)
+        cost.add(body if body.duration >= orelse.duration else orelse)
+        return cost
+    if isinstance(stmt, (ast.With, ast.AsyncWith)):
+        return _block_cost(stmt.body)
+    if isinstance(stmt, ast.Try):
+        cost = _block_cost(stmt.body)
+        cost.add(_block_cost(stmt.orelse))
+        cost.add(_block_cost(stmt.finalbody))
+        return cost
+    if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return RenderCost()
+    return _expression_cost(stmt)
+
+
+def _expression_cost(node):
+    cost = RenderCost()
+    for child in ast.walk(node):
+        if not isinstance(child, ast.Call):
+            continue
+        if is_animation_call(child):
+            cost.duration += call_duration(child)
+            continue
+        name = _call_name(child)
+        if name in UPDATER_CALLS:
+            cost.updaters += 1
+        elif name == "TracedPath":
+            cost.traced_paths += 1
+        elif name in TEXT_CLASSES:
+            cost.texts += 1
+            cost.objects += 1
+        elif name and name[0].isupper() and name not in ANIMATION_CLASSES:
+            cost.objects += 1
+    return cost
+
+
+def _call_name(call):
+    if isinstance(call.func, ast.Name):
+        return call.func.id
+    if isinstance(call.func, ast.Attribute):
+        return call.func.attr
+    return None
+
+
+def _loop_count(iterable):
+    if isinstance(iterable, ast.Call) and _call_name(iterable) == "range":
+        bounds = [constant_number(arg) for arg in iterable.args]
+        if bounds and all(bound is not None for bound in bounds):
+            return max(0, len(range(*(int(bound) for bound in bounds))))
+    if isinstance(iterable, (ast.List, ast.Tuple, ast.Set)):
+        return len(iterable.elts)
+    return 1
+
+
+def unchanged_animation_prefix(old_source, new_source, scene_name=SCENE_NAME):
+    # Number of leading animations whose code, and everything executed before
+    # them, is identical in both scripts and can therefore be reused.
+    old_tree = parse_script(old_source)
+    new_tree = parse_script(new_source)
+    if old_tree is None or new_tree is None:
+        return 0
+    old_construct = find_construct(old_tree, scene_name)
+    new_construct = find_construct(new_tree, scene_name)
+    if old_construct is None or new_construct is None:
+        return 0
+    if animation_statements(new_source, scene_name) is None:
+        return 0
+    if _outside_construct(old_tree, old_construct) != _outside_construct(new_tree, new_construct):
+        return 0
+
+    unchanged = 0
+    for old_stmt, new_stmt in zip(old_construct.body, new_construct.body):
+        if ast.dump(old_stmt) != ast.dump(new_stmt):
+            break
+        if isinstance(new_stmt, ast.Expr) and is_animation_call(new_stmt.value):
+            unchanged += 1
+    return unchanged
+
+
+def _outside_construct(tree, construct):
+    body = construct.body
+    construct.body = []
+    try:
+        return ast.dump(tree)
+    finally:
+        construct.body = body
@@ -3,6 +3,7 @@ import os
 import shutil
 import subprocess
 import threading
+import time
 import webbrowser
 from pathlib import Path
 from tkinter import filedialog
@@ -10,9 +11,29 @@ from tkinter import filedialog
 import customtkinter as ctk
 from PIL import Image
 
-from config import OUTPUT_DIR, SCENE_NAME, MAX_FIX_ATTEMPTS
+from config import (
+    DEFAULT_RENDER_PROFILE,
+    EXPORT_DEFAULT_FORMATS,
+    MAX_FIX_ATTEMPTS,
+    OUTPUT_DIR,
+    PREVIEW_PROXY_ENABLED,
+    RENDER_BUDGET_ACTION,
+    RENDER_BUDGET_SECONDS,
+    RENDER_COORDINATOR,
+    RENDER_PROFILES,
+    SCENE_NAME,
+    WATCH_RENDER_PROFILE,
+)
+from src.analyzer import estimate_cost, unchanged_animation_prefix
+from src.budget import choose_profile_within_budget, estimate_render_seconds
+from src.distributed import DistributedRenderer
+from src.exporter import export_video
 from src.generator import CodeGenerator
-from src.renderer import ManimRenderer
+from src.profiling import format_hotspots
+from src.renderer import ManimRenderer, profile_geometry
+from src.store import OutputStore
+from src.text_cache import shared_text_cache
+from src.watcher import ScriptWatcher, validate_script
 
 try:
     from tkvideoplayer import TkinterVideo
@@ -39,6 +60,16 @@ class App(ctk.CTk):
         logging.basicConfig(level=logging.INFO)
 
         self.generator = CodeGenerator()
+        self.store = OutputStore()
+        self._history_entries = {}
+        self._last_job = None
+        self._current_entry = None
+        self._pipeline_running = False
+        self._watcher = None
+        self._watch_lock = threading.Lock()
+        self._watch_generation = 0
+        self._watch_renderer = None
+        self._watch_thread = None
         self.last_video_path = None
         self.output_dir = Path(OUTPUT_DIR)
         self.output_video_path = None
@@ -57,6 +88,7 @@ class App(ctk.CTk):
                 "preview_area": "Preview in development",
                 "save_mp4": "Save MP4",
                 "save_gif": "Save GIF",
+                "export_all": "Export All Formats",
                 "open_external": "Open External",
                 "prompt_placeholder": "Describe the animation...",
                 "prompt_empty": "Prompt is empty.",
@@ -74,11 +106,35 @@ class App(ctk.CTk):
                 "progress": "Progress: {percent}%",
                 "progress_error": "Progress: error",
                 "paste": "Paste",
+                "refine": "Refine",
+                "watch": "Watch script",
+                "log_watch_on": "Watching {path}. Saved edits are rendered with the {profile} profile.",
+                "log_watch_off": "Stopped watching the script.",
+                "log_watch_invalid": "Edited script was not rendered: {error}",
+                "log_watch_cancel": "Newer edit saved, cancelling the running preview render.",
+                "log_watch_render": "Script changed, rendering a {profile} preview...",
+                "log_watch_done": "Preview updated in {seconds}s.",
+                "log_refining": "Refining the previous script...",
+                "log_refine_unavailable": "Nothing to refine yet, generate a video first.",
+                "log_refine_reuse": "Reusing {count} unchanged animations from the previous render.",
                 "log_fixing": "Render failed, attempting fix #{attempt}...",
                 "log_retry_limit": "Auto-fix stopped after {attempts} attempts.",
                 "log_gif_start": "Converting to GIF...",
                 "log_gif_saved": "GIF saved: {path}",
                 "log_gif_failed": "GIF conversion failed: {error}",
+                "log_export_start": "Exporting {formats} in one pass...",
+                "log_export_saved": "Exported {format}: {path}",
+                "log_export_failed": "Export failed: {error}",
+                "log_estimate": "Estimated render: ~{seconds}s ({profile}, {frames} frames, {updaters} updaters, {objects} objects).",
+                "log_budget_warning": "Estimated render time {seconds}s exceeds the {budget}s budget.",
+                "log_budget_downgrade": "Render budget exceeded, switching profile {old} -> {new}.",
+                "log_budget_simplify": "Render budget exceeded, asking the model to simplify the scene...",
+                "log_optimized": "Optimizer: {report}",
+                "log_profile": "Render profile saved to {path}. Hottest functions:",
+                "log_examples": "Added {count} similar working script(s) to the prompt as examples.",
+                "history": "History",
+                "history_empty": "No renders yet",
+                "log_recalled": "Loaded from history: {prompt}",
                 "blog_label": "Subscribe to support the project",
                 "blog_button": "Open blog",
             },
@@ -91,6 +147,7 @@ class App(ctk.CTk):
                 "preview_area": "Предпросмотр пока в разработке",
                 "save_mp4": "Сохранить MP4",
                 "save_gif": "Сохранить GIF",
+                "export_all": "Экспорт во все форматы",
                 "open_external": "Открыть внешним плеером",
                 "prompt_placeholder": "Опиши анимацию...",
                 "prompt_empty": "Промпт пуст.",
@@ -108,11 +165,35 @@ class App(ctk.CTk):
                 "progress": "Прогресс: {percent}%",
                 "progress_error": "Прогресс: ошибка",
                 "paste": "Вставить",
+                "refine": "Доработать",
+                "watch": "Следить за скриптом",
+                "log_watch_on": "Слежу за {path}. Сохранённые правки рендерятся в профиле {profile}.",
+                "log_watch_off": "Слежение за скриптом остановлено.",
+                "log_watch_invalid": "Изменённый скрипт не отрендерен: {error}",
+                "log_watch_cancel": "Сохранена новая правка, текущий рендер превью отменён.",
+                "log_watch_render": "Скрипт изменён, рендерю превью в профиле {profile}...",
+                "log_watch_done": "Превью обновлено за {seconds} с.",
+                "log_refining": "Доработка предыдущего скрипта...",
+                "log_refine_unavailable": "Нечего дорабатывать, сначала сгенерируйте видео.",
+                "log_refine_reuse": "Повторно используются {count} неизменённых анимаций из прошлого рендера.",
                 "log_fixing": "Рендер провалился, попытка исправления #{attempt}...",
                 "log_retry_limit": "Автоисправление остановлено после {attempts} попыток.",
                 "log_gif_start": "Конвертация в GIF...",
                 "log_gif_saved": "GIF сохранен: {path}",
                 "log_gif_failed": "Не удалось создать GIF: {error}",
+                "log_export_start": "Экспорт {formats} за один проход...",
+                "log_export_saved": "Экспортировано {format}: {path}",
+                "log_export_failed": "Экспорт не удался: {error}",
+                "log_estimate": "Оценка рендера: ~{seconds}с ({profile}, кадров: {frames}, апдейтеров: {updaters}, объектов: {objects}).",
+                "log_budget_warning": "Оценка времени рендера {seconds}с превышает бюджет {budget}с.",
+                "log_budget_downgrade": "Бюджет рендера превышен, профиль {old} -> {new}.",
+                "log_budget_simplify": "Бюджет рендера превышен, просим модель упростить сцену...",
+                "log_optimized": "Оптимизатор: {report}",
+                "log_profile": "Профиль рендера сохранён в {path}. Самые затратные функции:",
+                "log_examples": "В запрос добавлено похожих рабочих скриптов: {count}.",
+                "history": "История",
+                "history_empty": "Рендеров пока нет",
+                "log_recalled": "Загружено из истории: {prompt}",
                 "blog_label": "Подпишитесь, это поддержит проект",
                 "blog_button": "Открыть блог",
             },
@@ -129,6 +210,17 @@ class App(ctk.CTk):
         self.bind_all("<Control-v>", self._on_paste)
         self.bind_all("<Control-V>", self._on_paste)
 
+        threading.Thread(target=self._prewarm_text_cache, daemon=True).start()
+
+    def _prewarm_text_cache(self):
+        cache = shared_text_cache()
+        if cache is None:
+            return
+        try:
+            cache.prewarm()
+        except Exception:
+            logger.exception("Text cache pre-warm failed")
+
     def _setup_layout(self):
         self.grid_columnconfigure(0, weight=0)
         self.grid_columnconfigure(1, weight=2)
@@ -138,7 +230,7 @@ class App(ctk.CTk):
 
         self.sidebar = ctk.CTkFrame(self, corner_radius=0)
         self.sidebar.grid(row=0, column=0, sticky="nsew")
-        self.sidebar.grid_rowconfigure(5, weight=1)
+        self.sidebar.grid_rowconfigure(7, weight=1)
 
         title = ctk.CTkLabel(
             self.sidebar,
@@ -161,30 +253,42 @@ class App(ctk.CTk):
         self.quality_label = ctk.CTkLabel(self.sidebar, text=self._t("quality"))
         self.quality_label.grid(row=3, column=0, padx=20, pady=(10, 4), sticky="w")
 
-        self.quality_var = ctk.StringVar(value="Medium")
+        self.quality_var = ctk.StringVar(value=DEFAULT_RENDER_PROFILE)
         self.quality_menu = ctk.CTkOptionMenu(
             self.sidebar,
-            values=["Low", "Medium", "High"],
+            values=list(RENDER_PROFILES),
             variable=self.quality_var,
         )
         self.quality_menu.grid(row=4, column=0, padx=20, pady=(0, 10), sticky="ew")
 
+        self.history_label = ctk.CTkLabel(self.sidebar, text=self._t("history"))
+        self.history_label.grid(row=5, column=0, padx=20, pady=(10, 4), sticky="w")
+
+        self.history_var = ctk.StringVar(value="")
+        self.history_menu = ctk.CTkOptionMenu(
+            self.sidebar,
+            values=[""],
+            variable=self.history_var,
+            command=self._on_history_select,
+        )
+        self.history_menu.grid(row=6, column=0, padx=20, pady=(0, 10), sticky="ew")
+
         self.blog_label = ctk.CTkLabel(self.sidebar, text=self._t("blog_label"), wraplength=200)
-        self.blog_label.grid(row=5, column=0, padx=20, pady=(10, 6), sticky="w")
+        self.blog_label.grid(row=7, column=0, padx=20, pady=(10, 6), sticky="w")
 
         self.blog_button = ctk.CTkButton(
             self.sidebar,
             text=self._t("blog_button"),
             command=self._open_blog,
         )
-        self.blog_button.grid(row=6, column=0, padx=20, pady=(0, 10), sticky="ew")
+        self.blog_button.grid(row=8, column=0, padx=20, pady=(0, 10), sticky="ew")
 
         self.clear_button = ctk.CTkButton(
             self.sidebar,
             text=self._t("clear"),
             command=self._on_clear,
         )
-        self.clear_button.grid(row=7, column=0, padx=20, pady=(10, 20), sticky="ew")
+        self.clear_button.grid(row=9, column=0, padx=20, pady=(10, 20), sticky="ew")
 
         self.center = ctk.CTkFrame(self, corner_radius=0)
         self.center.grid(row=0, column=1, sticky="nsew")
@@ -212,6 +316,23 @@ class App(ctk.CTk):
         )
         self.paste_button.grid(row=0, column=0, sticky="w")
 
+        self.watch_var = ctk.BooleanVar(value=False)
+        self.watch_switch = ctk.CTkSwitch(
+            self.prompt_actions,
+            text=self._t("watch"),
+            variable=self.watch_var,
+            command=self._on_watch_toggle,
+        )
+        self.watch_switch.grid(row=0, column=1, padx=(0, 10), sticky="e")
+
+        self.refine_button = ctk.CTkButton(
+            self.prompt_actions,
+            text=self._t("refine"),
+            width=120,
+            command=self._on_refine,
+        )
+        self.refine_button.grid(row=0, column=2, sticky="e")
+
         self.generate_button = ctk.CTkButton(
             self.center,
             text=self._t("generate"),
@@ -275,14 +396,21 @@ class App(ctk.CTk):
             text=self._t("save_gif"),
             command=self._on_save_gif,
         )
-        self.save_gif_button.grid(row=3, column=0, padx=20, pady=(0, 10), sticky="ew")
+        self.save_gif_button.grid(row=3, column=0, padx=20, pady=(0, 8), sticky="ew")
+
+        self.export_button = ctk.CTkButton(
+            self.preview,
+            text=self._t("export_all"),
+            command=self._on_export_all,
+        )
+        self.export_button.grid(row=4, column=0, padx=20, pady=(0, 10), sticky="ew")
 
         self.open_button = ctk.CTkButton(
             self.preview,
             text=self._t("open_external"),
             command=self._on_open_player,
         )
-        self.open_button.grid(row=4, column=0, padx=20, pady=(0, 20), sticky="ew")
+        self.open_button.grid(row=5, column=0, padx=20, pady=(0, 20), sticky="ew")
 
         self.footer = ctk.CTkFrame(self, corner_radius=0)
         self.footer.grid(row=1, column=0, columnspan=3, sticky="ew")
@@ -308,12 +436,17 @@ class App(ctk.CTk):
     def _apply_language(self):
         self.language_label.configure(text=self._t("language"))
         self.quality_label.configure(text=self._t("quality"))
+        self.history_label.configure(text=self._t("history"))
+        self._refresh_history()
         self.clear_button.configure(text=self._t("clear"))
         self.paste_button.configure(text=self._t("paste"))
+        self.refine_button.configure(text=self._t("refine"))
+        self.watch_switch.configure(text=self._t("watch"))
         self.generate_button.configure(text=self._t("generate"))
         self.preview_label.configure(text=self._t("preview"))
         self.save_mp4_button.configure(text=self._t("save_mp4"))
         self.save_gif_button.configure(text=self._t("save_gif"))
+        self.export_button.configure(text=self._t("export_all"))
         self.open_button.configure(text=self._t("open_external"))
         self.blog_label.configure(text=self._t("blog_label"))
         self.blog_button.configure(text=self._t("blog_button"))
@@ -385,6 +518,7 @@ class App(ctk.CTk):
     def _set_generate_state(self, enabled):
         def _apply():
             self.generate_button.configure(state="normal" if enabled else "disabled")
+            self.refine_button.configure(state="normal" if enabled else "disabled")
 
         self.after(0, _apply)
 
@@ -393,6 +527,7 @@ class App(ctk.CTk):
             state = "normal" if enabled else "disabled"
             self.save_mp4_button.configure(state=state)
             self.save_gif_button.configure(state=state)
+            self.export_button.configure(state=state)
             self.open_button.configure(state=state)
 
         self.after(0, _apply)
@@ -414,27 +549,92 @@ class App(ctk.CTk):
 
         self.after(0, _apply)
 
-    def _quality_flag(self):
+    def _render_profile(self):
         value = self.quality_var.get()
-        return {"Low": "-ql", "Medium": "-qm", "High": "-qh"}.get(value, "-qm")
+        return value if value in RENDER_PROFILES else DEFAULT_RENDER_PROFILE
 
-    def _build_fix_prompt(self, user_prompt, error, script_path):
+    def _make_renderer(self, profile):
+        if RENDER_COORDINATOR:
+            return DistributedRenderer(RENDER_COORDINATOR, profile=profile)
+        return ManimRenderer(profile=profile)
+
+    def _build_simplify_prompt(self, user_prompt, cost, seconds, script_path):
         code = ""
-        if script_path:
-            try:
-                code = Path(script_path).read_text(encoding="utf-8")
-            except Exception:
-                code = ""
+        try:
+            code = Path(script_path).read_text(encoding="utf-8")
+        except Exception:
+            code = ""
 
         parts = [
             user_prompt.strip() if user_prompt else "",
-            "The previous Manim code failed to render.",
-            f"Error output:\n{error}".strip(),
+            (
+                f"The previous Manim code is too expensive to render: about {int(seconds)}s "
+                f"for a budget of {RENDER_BUDGET_SECONDS}s."
+            ),
+            (
+                f"It runs for {cost.duration:.0f}s of animation with {cost.updaters} updaters, "
+                f"{cost.traced_paths} TracedPath objects and {cost.objects} mobjects."
+            ),
             f"Previous code:\n{code}".strip(),
-            "Fix the code and output the complete corrected script only.",
+            (
+                "Simplify the scene: shorten long run_time values, use fewer updaters and "
+                "TracedPath trails, and fewer objects. Output the complete script only."
+            ),
         ]
         return "\n\n".join(part for part in parts if part) + "\n"
 
+    def _enforce_budget(self, prompt, script_path, profile):
+        if not RENDER_BUDGET_SECONDS:
+            return script_path, profile
+        try:
+            source = Path(script_path).read_text(encoding="utf-8")
+        except Exception:
+            return script_path, profile
+        cost = estimate_cost(source, SCENE_NAME)
+        if cost is None:
+            return script_path, profile
+
+        seconds = self._log_estimate(cost, profile)
+        if seconds <= RENDER_BUDGET_SECONDS:
+            return script_path, profile
+
+        if RENDER_BUDGET_ACTION == "simplify":
+            self._append_log(self._t("log_budget_simplify"))
+            simplify_prompt = self._build_simplify_prompt(prompt, cost, seconds, script_path)
+            script_path = self.generator.generate(simplify_prompt, query=prompt)
+            cost = estimate_cost(Path(script_path).read_text(encoding="utf-8"), SCENE_NAME)
+            if cost is None:
+                return script_path, profile
+            seconds = self._log_estimate(cost, profile)
+        elif RENDER_BUDGET_ACTION == "downgrade":
+            new_profile = choose_profile_within_budget(cost, RENDER_BUDGET_SECONDS, profile)
+            if new_profile != profile:
+                self._append_log(self._t("log_budget_downgrade", old=profile, new=new_profile))
+                profile = new_profile
+                seconds = self._log_estimate(cost, profile)
+
+        if seconds > RENDER_BUDGET_SECONDS:
+            self._append_log(
+                self._t("log_budget_warning", seconds=int(seconds), budget=RENDER_BUDGET_SECONDS),
+                tag="error",
+            )
+        return script_path, profile
+
+    def _log_estimate(self, cost, profile):
+        seconds = estimate_render_seconds(cost, profile)
+        frames = cost.frames(profile_geometry(profile)[2])
+        self._append_log(
+            self._t(
+                "log_estimate",
+                seconds=int(seconds),
+                profile=profile,
+                frames=frames,
+                updaters=cost.updaters + cost.traced_paths,
+                objects=cost.objects,
+            )
+        )
+        return seconds
+
     def _on_generate_render(self):
         prompt = self._get_prompt()
         if not prompt:
@@ -447,10 +647,59 @@ class App(ctk.CTk):
         thread = threading.Thread(target=self._run_pipeline, args=(prompt,), daemon=True)
         thread.start()
 
-    def _run_pipeline(self, prompt):
+    def _on_refine(self):
+        prompt = self._get_prompt()
+        if not prompt:
+            self._append_log(self._t("prompt_empty"))
+            return
+        if self._last_job is None:
+            self._append_log(self._t("log_refine_unavailable"))
+            return
+
+        self._set_generate_state(False)
+        self._set_action_state(False)
+        self._set_progress(5)
+        thread = threading.Thread(target=self._run_pipeline, args=(prompt, True), daemon=True)
+        thread.start()
+
+    def _log_profile(self, renderer):
+        report = getattr(renderer, "last_profile", None)
+        if not report:
+            return
+        self._append_log(self._t("log_profile", path=report["profile"] or report["collapsed"]))
+        for line in format_hotspots(report["hotspots"]):
+            self._append_log(line)
+
+    def _reusable_animations(self, script_path, profile):
+        previous = self._last_job
+        if not previous or previous.get("profile") != profile or not previous.get("partial_files"):
+            return 0
+        try:
+            source = Path(script_path).read_text(encoding="utf-8")
+        except Exception:
+            return 0
+        return unchanged_animation_prefix(previous["script"], source, SCENE_NAME)
+
+    def _remember_job(self, script_path, profile, renderer):
+        try:
+            script = Path(script_path).read_text(encoding="utf-8")
+        except Exception:
+            self._last_job = None
+            return
+        self._last_job = {
+            "script": script,
+            "profile": profile,
+            "partial_files": list(getattr(renderer, "last_partial_files", [])),
+        }
+
+    def _run_pipeline(self, prompt, refine=False):
+        self._pipeline_running = True
         attempt = 0
         last_error = ""
         script_path = None
+        profile = self._render_profile()
+        timings = {"generate": 0.0, "render": 0.0}
+        started = time.monotonic()
 
         try:
             while True:
@@ -463,13 +712,22 @@ class App(ctk.CTk):
 
                 try:
                     self._set_progress(20)
-                    if attempt == 1:
+                    stage_start = time.monotonic()
+                    if attempt == 1 and refine:
+                        self._append_log(self._t("log_refining"))
+                        script_path = self.generator.refine(self._last_job["script"], prompt)
+                    elif attempt == 1:
                         self._append_log(self._t("log_generating"))
                         script_path = self.generator.generate(prompt)
                     else:
                         self._append_log(self._t("log_fixing", attempt=attempt - 1))
-                        fix_prompt = self._build_fix_prompt(prompt, last_error, script_path)
-                        script_path = self.generator.generate(fix_prompt)
+                        script_path = self.generator.fix(prompt, last_error, script_path)
+                    if self.generator.last_examples:
+                        self._append_log(self._t("log_examples", count=len(self.generator.last_examples)))
+                    for report in self.generator.last_optimizations:
+                        self._append_log(self._t("log_optimized", report=report))
+                    script_path, profile = self._enforce_budget(prompt, script_path, profile)
+                    timings["generate"] += time.monotonic() - stage_start
                 except Exception as exc:
                     logger.exception("Generation failed")
                     self._append_log(self._t("log_error", error=exc), tag="error")
@@ -479,8 +737,15 @@ class App(ctk.CTk):
                 try:
                     self._append_log(self._t("log_rendering_start"))
                     self._set_progress(55)
-                    renderer = ManimRenderer(quality_flag=self._quality_flag())
-                    video_path = renderer.render()
+                    stage_start = time.monotonic()
+                    renderer = self._make_renderer(profile)
+                    reusable = self._reusable_animations(script_path, profile) if refine else 0
+                    if reusable and hasattr(renderer, "render_tail"):
+                        self._append_log(self._t("log_refine_reuse", count=reusable))
+                        video_path = renderer.render_tail(reusable, self._last_job["partial_files"])
+                    else:
+                        video_path = renderer.render()
+                    timings["render"] = time.monotonic() - stage_start
                 except Exception as exc:
                     logger.exception("Render failed")
                     stderr = ""
@@ -493,23 +758,114 @@ class App(ctk.CTk):
                         self._append_log(self._t("log_error", error=exc), tag="error")
                     continue
 
-                output_path = self._store_rendered_video(video_path)
+                timings["total"] = time.monotonic() - started
+                timings["attempts"] = attempt
+                self._remember_job(script_path, profile, renderer)
+                self._log_profile(renderer)
+                if not refine:
+                    self.generator.remember_success(prompt, script_path)
+                output_path = self._store_rendered_video(video_path, prompt, script_path, profile, timings)
                 self.last_video_path = output_path
                 self._append_log(self._t("log_rendered", path=output_path))
+                preview_path = self._preview_video(self._current_entry)
                 preview_image_path = None
                 if self.video_player is None:
-                    preview_image_path = self._generate_preview_image(output_path)
-                self._update_preview(output_path, preview_image_path)
+                    preview_image_path = self._generate_preview_image(preview_path)
+                self._update_preview(preview_path, preview_image_path)
                 self._set_progress(100)
                 self._set_action_state(True)
                 break
         finally:
+            self._pipeline_running = False
+            if self._watcher is not None:
+                self._watcher.mark_seen()
             self._set_generate_state(True)
 
+    def _on_watch_toggle(self):
+        if self.watch_var.get():
+            script_path = self.output_dir / "script.py"
+            self._watcher = ScriptWatcher(script_path, self._on_script_changed).start()
+            self._append_log(self._t("log_watch_on", path=script_path, profile=WATCH_RENDER_PROFILE))
+            return
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+        with self._watch_lock:
+            if self._watch_renderer is not None:
+                self._watch_renderer.cancel()
+        self._append_log(self._t("log_watch_off"))
+
+    def _on_script_changed(self, source):
+        # Called from the watcher thread once an edit has settled.
+        if self._pipeline_running:
+            return
+        error = validate_script(source, SCENE_NAME)
+        if error:
+            self._append_log(self._t("log_watch_invalid", error=error), tag="error")
+            return
+        with self._watch_lock:
+            self._watch_generation += 1
+            if self._watch_renderer is not None and self._watch_thread is not None and self._watch_thread.is_alive():
+                self._append_log(self._t("log_watch_cancel"))
+                self._watch_renderer.cancel()
+            renderer = ManimRenderer(profile=WATCH_RENDER_PROFILE, media_dir=Path("media") / "watch")
+            thread = threading.Thread(
+                target=self._run_watch_render,
+                args=(renderer, self._watch_generation, self._watch_thread),
+                daemon=True,
+            )
+            self._watch_renderer = renderer
+            self._watch_thread = thread
+        thread.start()
+
+    def _run_watch_render(self, renderer, generation, previous_thread):
+        # The cancelled render shares the media directory, let it exit first.
+        if previous_thread is not None:
+            previous_thread.join()
+        if renderer.cancelled:
+            return
+        self._append_log(self._t("log_watch_render", profile=WATCH_RENDER_PROFILE))
+        self._set_progress(55)
+        started = time.monotonic()
+        try:
+            video_path = renderer.render()
+        except Exception as exc:
+            if renderer.cancelled:
+                return
+            logger.exception("Watch render failed")
+            self._append_log((renderer.last_stderr or "").strip() or str(exc), tag="error")
+            self._set_progress(0, text=self._t("progress_error"))
+            return
+        if generation != self._watch_generation:
+            return
+
+        preview_dir = self.output_dir / "watch"
+        preview_dir.mkdir(parents=True, exist_ok=True)
+        target = preview_dir / f"preview_{generation}.mp4"
+        shutil.move(video_path, target)
+        for old in preview_dir.glob("preview_*.mp4"):
+            if old != target:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+
+        self._current_entry = None
+        self.output_video_path = str(target)
+        self.last_video_path = str(target)
+        preview_image_path = None
+        if self.video_player is None:
+            preview_image_path = self._generate_preview_image(str(target))
+        self._update_preview(str(target), preview_image_path)
+        self._append_log(self._t("log_watch_done", seconds=round(time.monotonic() - started, 1)))
+        self._set_progress(100)
+        self._set_action_state(True)
+
     def _on_clear(self):
         self._set_prompt_placeholder()
         self.last_video_path = None
         self.output_video_path = None
+        self._current_entry = None
         self._set_action_state(False)
         self._reset_preview()
         self._set_progress(0)
@@ -538,7 +894,7 @@ class App(ctk.CTk):
         default_ext = ".mp4" if ext == "mp4" else ".gif"
         file_path = filedialog.asksaveasfilename(
             defaultextension=default_ext,
-            initialfile=source.with_suffix(default_ext).name,
+            initialfile=f"{SCENE_NAME}{default_ext}",
             filetypes=filetypes,
         )
         if not file_path:
@@ -547,30 +903,46 @@ class App(ctk.CTk):
         target = Path(file_path)
         if ext == "gif" or target.suffix.lower() == ".gif":
             self._append_log(self._t("log_gif_start"))
-            cmd = [
-                "ffmpeg",
-                "-y",
-                "-i",
-                str(source),
-                "-vf",
-                "fps=15,scale=640:-1:flags=lanczos",
-                str(target),
-            ]
-            result = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
-            if result.returncode != 0:
-                error_text = result.stderr.strip() or "ffmpeg failed"
-                self._append_log(self._t("log_gif_failed", error=error_text), tag="error")
+            try:
+                outputs = export_video(source, target, ["gif"])
+            except Exception as exc:
+                self._append_log(self._t("log_gif_failed", error=exc), tag="error")
                 return
-            self._append_log(self._t("log_gif_saved", path=file_path))
+            self._append_log(self._t("log_gif_saved", path=outputs["gif"]))
         else:
-            shutil.copy2(source, file_path)
+            self.store.export(source, file_path)
             self._append_log(self._t("log_video_saved", path=file_path))
 
+    def _on_export_all(self):
+        source_path = self.output_video_path or self.last_video_path
+        if not source_path:
+            self._append_log(self._t("log_no_video_save"))
+            return
+        source = Path(source_path)
+        if not source.exists():
+            self._append_log(self._t("log_video_not_found"))
+            return
+
+        file_path = filedialog.asksaveasfilename(
+            initialfile=SCENE_NAME,
+            filetypes=[("All files", "*.*")],
+        )
+        if not file_path:
+            return
+        thread = threading.Thread(target=self._run_export, args=(source, file_path), daemon=True)
+        thread.start()
+
+    def _run_export(self, source, output_base):
+        self._append_log(self._t("log_export_start", formats=", ".join(EXPORT_DEFAULT_FORMATS)))
+        try:
+            outputs = export_video(source, output_base, EXPORT_DEFAULT_FORMATS)
+        except Exception as exc:
+            logger.exception("Export failed")
+            self._append_log(self._t("log_export_failed", error=exc), tag="error")
+            return
+        for fmt, path in outputs.items():
+            self._append_log(self._t("log_export_saved", format=fmt, path=path))
+
     def _on_open_player(self):
         source_path = self.output_video_path or self.last_video_path
         if not source_path:
@@ -592,13 +964,82 @@ class App(ctk.CTk):
         except Exception as exc:
             self._append_log(self._t("log_open_failed", error=exc))
 
-    def _store_rendered_video(self, video_path):
-        self.output_dir.mkdir(parents=True, exist_ok=True)
-        output_path = self.output_dir / f"{SCENE_NAME}.mp4"
-        shutil.copy2(video_path, output_path)
-        self.output_video_path = str(output_path)
+    def _store_rendered_video(self, video_path, prompt="", script_path=None, profile=None, timings=None):
+        entry = self.store.publish(
+            video_path,
+            prompt=prompt,
+            script_path=script_path,
+            profile=profile,
+            timings=timings,
+        )
+        try:
+            self.store.link_latest(entry, self.output_dir / f"{SCENE_NAME}.mp4")
+        except OSError as exc:
+            logger.warning("Failed to update latest video link: %s", exc)
+        self._current_entry = entry
+        self.output_video_path = str(self.store.video_path(entry))
+        self.after(0, self._refresh_history)
         return self.output_video_path
 
+    def _preview_video(self, entry):
+        video_path = str(self.store.video_path(entry))
+        if not PREVIEW_PROXY_ENABLED:
+            return video_path
+        try:
+            return str(self.store.ensure_proxy(entry))
+        except Exception as exc:
+            logger.warning("Preview proxy failed, using the full video: %s", exc)
+            return video_path
+
+    def _refresh_history(self):
+        self._history_entries = {}
+        for entry in self.store.entries():
+            created = time.strftime("%m-%d %H:%M", time.localtime(entry["created"]))
+            prompt = " ".join(entry.get("prompt", "").split())
+            if len(prompt) > 28:
+                prompt = prompt[:27] + "…"
+            label = f"{created} {prompt}".strip()
+            if label in self._history_entries:
+                label = f"{label} ({entry['id'][-6:]})"
+            self._history_entries[label] = entry
+        labels = list(self._history_entries) or [self._t("history_empty")]
+        self.history_menu.configure(values=labels)
+        if self.history_var.get() not in self._history_entries:
+            self.history_var.set(labels[0] if not self._history_entries else "")
+
+    def _on_history_select(self, label):
+        entry = self._history_entries.get(label)
+        if entry is None:
+            return
+        video_path = self.store.video_path(entry)
+        if not video_path.exists():
+            self._append_log(self._t("log_video_not_found"))
+            return
+        self.output_video_path = str(video_path)
+        self.last_video_path = str(video_path)
+        script_path = self.store.script_path(entry)
+        if script_path is not None and script_path.exists():
+            self._last_job = {
+                "script": script_path.read_text(encoding="utf-8"),
+                "profile": entry.get("profile"),
+                "partial_files": [],
+            }
+        self._append_log(self._t("log_recalled", prompt=entry.get("prompt", "")))
+        self._current_entry = entry
+        # Building the proxy runs ffmpeg, which would freeze the window.
+        threading.Thread(target=self._load_history_preview, args=(entry,), daemon=True).start()
+
+    def _load_history_preview(self, entry):
+        preview_path = self._preview_video(entry)
+        preview_image_path = None
+        if self.video_player is None:
+            preview_image_path = self._generate_preview_image(preview_path)
+        if self._current_entry is not entry:
+            # Another entry was picked while this one was loading.
+            return
+        self._update_preview(preview_path, preview_image_path)
+        self._set_action_state(True)
+
     def _generate_preview_image(self, video_path):
         preview_path = self.output_dir / "preview.png"
         cmd = [
@@ -0,0 +1,58 @@
+import logging
+
+from config import RENDER_COST_MODEL, RENDER_PROFILES
+from src.renderer import profile_geometry, resolve_profile
+
+
+logger = logging.getLogger(__name__)
+
+PRESET_FACTORS = {
+    "ultrafast": 0.3,
+    "superfast": 0.4,
+    "veryfast": 0.6,
+    "faster": 0.8,
+    "fast": 0.9,
+    "medium": 1.0,
+    "slow": 2.5,
+    "slower": 4.0,
+    "veryslow": 8.0,
+}
+
+
+def estimate_render_seconds(cost, profile, model=None):
+    model = RENDER_COST_MODEL if model is None else model
+    width, height, fps = profile_geometry(profile)
+    frames = cost.frames(fps)
+    megapixels = width * height / 1_000_000
+
+    per_frame = (
+        model["frame"]
+        + megapixels * model["megapixel"]
+        + cost.objects * model["object"] * megapixels
+        + cost.updaters * model["updater"]
+        + cost.traced_paths * model["traced_path_point"] * frames / 2
+    )
+    seconds = model["startup"] + cost.texts * model["text"] + frames * per_frame
+
+    encode = resolve_profile(profile).get("encode")
+    if encode:
+        factor = PRESET_FACTORS.get(encode.get("preset", "medium"), 1.0)
+        seconds += frames * megapixels * model["encode_megapixel"] * factor
+    return seconds
+
+
+def estimate_all_profiles(cost):
+    return {name: estimate_render_seconds(cost, name) for name in RENDER_PROFILES}
+
+
+def choose_profile_within_budget(cost, budget, current):
+    estimates = estimate_all_profiles(cost)
+    current_seconds = estimates.get(current, estimate_render_seconds(cost, current))
+    candidates = [
+        (seconds, name)
+        for name, seconds in estimates.items()
+        if seconds <= budget and seconds <= current_seconds
+    ]
+    if candidates:
+        return max(candidates)[1]
+    return min((seconds, name) for name, seconds in estimates.items())[1]
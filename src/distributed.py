@@ -0,0 +1,643 @@
+import argparse
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import shutil
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+
+from config import (
+    COORDINATOR_ADDRESS,
+    COORDINATOR_HEARTBEAT_SECONDS,
+    COORDINATOR_JOB_TTL,
+    COORDINATOR_MAX_RETRIES,
+    COORDINATOR_RESULT_DIR,
+    COORDINATOR_SECRET,
+    COORDINATOR_STEAL_AFTER,
+    COORDINATOR_WORKER_TIMEOUT,
+    DEFAULT_RENDER_PROFILE,
+    OUTPUT_DIR,
+    RENDER_COORDINATOR,
+    SCENE_NAME,
+)
+from src.renderer import ManimRenderer
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def parse_address(address):
+    host, _, port = str(address).rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def secret_matches(expected, given):
+    if not expected:
+        return True
+    return isinstance(given, str) and hmac.compare_digest(expected.encode("utf-8"), given.encode("utf-8"))
+
+
+def send_message(stream, message, payload=None, payload_path=None):
+    message = dict(message)
+    if payload is not None:
+        message["size"] = len(payload)
+    elif payload_path is not None:
+        message["size"] = Path(payload_path).stat().st_size
+    stream.write(json.dumps(message).encode("utf-8") + b"\n")
+    if payload is not None:
+        stream.write(payload)
+    elif payload_path is not None:
+        with open(payload_path, "rb") as handle:
+            shutil.copyfileobj(handle, stream, CHUNK_SIZE)
+    stream.flush()
+
+
+def read_message(stream):
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def read_payload(stream, size, path=None):
+    handle = open(path, "wb") if path is not None else None
+    chunks = []
+    remaining = size
+    try:
+        while remaining > 0:
+            chunk = stream.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise ConnectionError("Connection closed during transfer")
+            remaining -= len(chunk)
+            if handle is not None:
+                handle.write(chunk)
+            else:
+                chunks.append(chunk)
+    finally:
+        if handle is not None:
+            handle.close()
+    return path if path is not None else b"".join(chunks)
+
+
+class RenderJob:
+    def __init__(self, script, profile=None, scene_name=SCENE_NAME):
+        self.id = uuid.uuid4().hex[:12]
+        self.script = script
+        self.profile = profile or DEFAULT_RENDER_PROFILE
+        self.scene_name = scene_name
+        self.status = "pending"
+        self.attempts = 0
+        self.assignees = {}
+        self.stolen = False
+        self.events = []
+        self.result_path = None
+        self.error = None
+        self.created = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+
+class RenderCoordinator:
+    def __init__(
+        self,
+        address=COORDINATOR_ADDRESS,
+        result_dir=COORDINATOR_RESULT_DIR,
+        heartbeat=COORDINATOR_HEARTBEAT_SECONDS,
+        worker_timeout=COORDINATOR_WORKER_TIMEOUT,
+        max_retries=COORDINATOR_MAX_RETRIES,
+        steal_after=COORDINATOR_STEAL_AFTER,
+        secret=COORDINATOR_SECRET,
+        job_ttl=COORDINATOR_JOB_TTL,
+    ):
+        host, port = parse_address(address)
+        # Workers execute whatever scripts are submitted, so an address other
+        # hosts can reach must be protected by a shared secret.
+        if not secret and not is_loopback(host):
+            raise RuntimeError(
+                f"Refusing to listen on {host} without a secret; set COORDINATOR_SECRET or pass --secret"
+            )
+        self.secret = secret
+        self.job_ttl = job_ttl
+        self.result_dir = Path(result_dir)
+        self.heartbeat = heartbeat
+        self.worker_timeout = worker_timeout
+        self.max_retries = max_retries
+        self.steal_after = steal_after
+        self.jobs = {}
+        self.workers = {}
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self.server = _CoordinatorServer((host, port), _ConnectionHandler)
+        self.server.coordinator = self
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return f"{host}:{port}"
+
+    def start(self):
+        self.result_dir.mkdir(parents=True, exist_ok=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._reap_loop, daemon=True).start()
+        logger.info("Coordinator listening on %s", self.address)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def submit(self, script, profile=None, scene_name=SCENE_NAME):
+        job = RenderJob(script, profile, scene_name)
+        with self._cond:
+            self.jobs[job.id] = job
+            self._pending.append(job)
+            self._cond.notify_all()
+        logger.info("Queued job %s (%s)", job.id, job.profile)
+        return job
+
+    def wait(self, job_id, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            job = self.jobs[job_id]
+            while not job.finished:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+        return job
+
+    def register_worker(self, name):
+        worker_id = f"{name}-{uuid.uuid4().hex[:6]}"
+        with self._cond:
+            self.workers[worker_id] = {"name": name, "last_seen": time.monotonic(), "jobs": set()}
+        logger.info("Worker %s registered", worker_id)
+        return worker_id
+
+    def touch(self, worker_id):
+        with self._cond:
+            worker = self.workers.setdefault(worker_id, {"name": worker_id, "jobs": set()})
+            worker["last_seen"] = time.monotonic()
+
+    def assign(self, worker_id):
+        with self._cond:
+            worker = self.workers.get(worker_id)
+            if worker is None:
+                return None
+            while self._pending:
+                job = self._pending.popleft()
+                if job.status != "pending":
+                    continue
+                job.status = "running"
+                job.attempts += 1
+                return self._attach(job, worker_id, worker)
+
+            job = self._straggler(worker_id)
+            if job is not None:
+                job.stolen = True
+                logger.info("Worker %s steals straggling job %s", worker_id, job.id)
+                return self._attach(job, worker_id, worker)
+        return None
+
+    def report_progress(self, job_id, line):
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None or job.finished:
+                return
+            job.events.append(line)
+            self._cond.notify_all()
+
+    def complete(self, job_id, worker_id, path):
+        with self._cond:
+            job = self.jobs.get(job_id)
+            self._detach(job, worker_id)
+            if job is None or job.finished:
+                Path(path).unlink(missing_ok=True)
+                return
+            result_path = self.result_dir / f"{job.id}.mp4"
+            os.replace(path, result_path)
+            job.result_path = str(result_path)
+            job.status = "done"
+            job.finished_at = time.monotonic()
+            self._cond.notify_all()
+        logger.info("Job %s finished on %s", job_id, worker_id)
+
+    def fail(self, job_id, worker_id, error):
+        with self._cond:
+            job = self.jobs.get(job_id)
+            self._detach(job, worker_id)
+            if job is None or job.finished:
+                return
+            if job.assignees:
+                job.events.append(f"Worker {worker_id} failed, waiting for the other copy")
+            else:
+                job.status = "failed"
+                job.error = error
+                job.finished_at = time.monotonic()
+            self._cond.notify_all()
+        logger.warning("Job %s failed on %s", job_id, worker_id)
+
+    def drop_worker(self, worker_id, reason):
+        with self._cond:
+            worker = self.workers.pop(worker_id, None)
+            if worker is None:
+                return
+            logger.warning("Dropping worker %s: %s", worker_id, reason)
+            for job_id in worker["jobs"]:
+                job = self.jobs.get(job_id)
+                if job is None or job.finished:
+                    continue
+                job.assignees.pop(worker_id, None)
+                if job.assignees:
+                    continue
+                if job.attempts <= self.max_retries:
+                    job.status = "pending"
+                    job.events.append(f"Worker {worker_id} lost ({reason}), retrying")
+                    self._pending.appendleft(job)
+                else:
+                    job.status = "failed"
+                    job.error = f"Worker lost ({reason}) after {job.attempts} attempts"
+                    job.finished_at = time.monotonic()
+            self._cond.notify_all()
+
+    def forget(self, job_id):
+        with self._cond:
+            job = self.jobs.pop(job_id, None)
+        if job is not None and job.result_path:
+            Path(job.result_path).unlink(missing_ok=True)
+
+    def _attach(self, job, worker_id, worker):
+        job.assignees[worker_id] = time.monotonic()
+        worker["jobs"].add(job.id)
+        return job
+
+    def _detach(self, job, worker_id):
+        worker = self.workers.get(worker_id)
+        if worker is not None and job is not None:
+            worker["jobs"].discard(job.id)
+        if job is not None:
+            job.assignees.pop(worker_id, None)
+
+    def _straggler(self, worker_id):
+        now = time.monotonic()
+        candidates = [
+            job
+            for job in self.jobs.values()
+            if job.status == "running"
+            and not job.stolen
+            and len(job.assignees) == 1
+            and worker_id not in job.assignees
+            and now - min(job.assignees.values()) > self.steal_after
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda job: min(job.assignees.values()))
+
+    def _reap_loop(self):
+        while not self._stop.wait(self.heartbeat):
+            now = time.monotonic()
+            with self._cond:
+                stale = [
+                    worker_id
+                    for worker_id, worker in self.workers.items()
+                    if now - worker.get("last_seen", now) > self.worker_timeout
+                ]
+            for worker_id in stale:
+                self.drop_worker(worker_id, "missed heartbeats")
+            # Results are normally removed once sent; this catches jobs whose
+            # client went away before the render finished.
+            with self._cond:
+                expired = [
+                    job_id
+                    for job_id, job in self.jobs.items()
+                    if job.finished and now - job.finished_at > self.job_ttl
+                ]
+            for job_id in expired:
+                self.forget(job_id)
+
+
+class _CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _ConnectionHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        coordinator = self.server.coordinator
+        try:
+            message = read_message(self.rfile)
+            if message is None:
+                return
+            if message.get("type") in ("register", "submit") and not secret_matches(
+                coordinator.secret, message.get("secret")
+            ):
+                logger.warning("Rejected %s from %s: wrong secret", message.get("type"), self.client_address[0])
+                send_message(self.wfile, {"type": "rejected", "error": "wrong or missing coordinator secret"})
+                return
+            if message.get("type") == "register":
+                self._serve_worker(coordinator, message)
+            elif message.get("type") == "submit":
+                self._serve_client(coordinator, message)
+        except (ConnectionError, OSError, ValueError) as exc:
+            logger.info("Connection closed: %s", exc)
+
+    def _serve_worker(self, coordinator, message):
+        worker_id = coordinator.register_worker(message.get("name") or "worker")
+        try:
+            send_message(self.wfile, {"type": "registered", "worker": worker_id, "heartbeat": coordinator.heartbeat})
+            while True:
+                message = read_message(self.rfile)
+                if message is None:
+                    break
+                coordinator.touch(worker_id)
+                kind = message.get("type")
+                if kind == "pull":
+                    job = coordinator.assign(worker_id)
+                    if job is None:
+                        send_message(self.wfile, {"type": "idle", "retry": coordinator.heartbeat})
+                    else:
+                        send_message(
+                            self.wfile,
+                            {"type": "job", "job": job.id, "profile": job.profile, "scene": job.scene_name},
+                            payload=job.script,
+                        )
+                elif kind == "progress":
+                    coordinator.report_progress(message["job"], message.get("line", ""))
+                elif kind == "result":
+                    part = coordinator.result_dir / f"{message['job']}.{worker_id}.part"
+                    try:
+                        read_payload(self.rfile, message["size"], part)
+                    except Exception:
+                        part.unlink(missing_ok=True)
+                        raise
+                    coordinator.complete(message["job"], worker_id, part)
+                elif kind == "failed":
+                    coordinator.fail(message["job"], worker_id, message.get("error", "render failed"))
+        finally:
+            coordinator.drop_worker(worker_id, "disconnected")
+
+    def _serve_client(self, coordinator, message):
+        script = read_payload(self.rfile, message.get("size", 0))
+        job = coordinator.submit(script, message.get("profile"), message.get("scene") or SCENE_NAME)
+        send_message(self.wfile, {"type": "accepted", "job": job.id})
+        sent = 0
+        while True:
+            with coordinator._cond:
+                while len(job.events) == sent and not job.finished:
+                    coordinator._cond.wait(coordinator.heartbeat)
+                events = job.events[sent:]
+                finished = job.finished
+            for line in events:
+                send_message(self.wfile, {"type": "progress", "job": job.id, "line": line})
+            sent += len(events)
+            if finished:
+                break
+        if job.status == "done":
+            send_message(self.wfile, {"type": "result", "job": job.id}, payload_path=job.result_path)
+        else:
+            send_message(self.wfile, {"type": "failed", "job": job.id, "error": job.error or "render failed"})
+        coordinator.forget(job.id)
+
+
+class RenderWorker:
+    def __init__(
+        self,
+        address=COORDINATOR_ADDRESS,
+        name=None,
+        work_dir=None,
+        retry_delay=2.0,
+        secret=COORDINATOR_SECRET,
+    ):
+        self.address = parse_address(address)
+        self.secret = secret
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.work_dir = Path(work_dir or tempfile.mkdtemp(prefix="manim-worker-"))
+        self.retry_delay = retry_delay
+        self._stop = threading.Event()
+        self._send_lock = threading.Lock()
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self._session()
+            except (ConnectionError, OSError, ValueError) as exc:
+                logger.warning("Worker %s lost the coordinator: %s", self.name, exc)
+            except RuntimeError as exc:
+                logger.error("%s", exc)
+                break
+            self._stop.wait(self.retry_delay)
+
+    def stop(self):
+        self._stop.set()
+
+    def _send(self, stream, message, **kwargs):
+        with self._send_lock:
+            send_message(stream, message, **kwargs)
+
+    def _session(self):
+        with socket.create_connection(self.address) as sock:
+            stream = sock.makefile("rwb")
+            self._send(stream, {"type": "register", "name": self.name, "secret": self.secret})
+            reply = read_message(stream)
+            if reply is None:
+                raise ConnectionError("Coordinator closed the connection")
+            if reply.get("type") == "rejected":
+                self._stop.set()
+                raise RuntimeError(f"Coordinator rejected the worker: {reply.get('error')}")
+            interval = float(reply.get("heartbeat", COORDINATOR_HEARTBEAT_SECONDS))
+            logger.info("Worker registered as %s", reply.get("worker"))
+
+            session_done = threading.Event()
+            heartbeat = threading.Thread(
+                target=self._heartbeat_loop,
+                args=(stream, interval, session_done),
+                daemon=True,
+            )
+            heartbeat.start()
+            try:
+                while not self._stop.is_set():
+                    self._send(stream, {"type": "pull"})
+                    message = read_message(stream)
+                    if message is None:
+                        raise ConnectionError("Coordinator closed the connection")
+                    if message.get("type") == "idle":
+                        self._stop.wait(float(message.get("retry", interval)))
+                    elif message.get("type") == "job":
+                        script = read_payload(stream, message["size"])
+                        self._run_job(stream, message, script)
+            finally:
+                session_done.set()
+
+    def _heartbeat_loop(self, stream, interval, session_done):
+        while not session_done.wait(interval):
+            try:
+                self._send(stream, {"type": "heartbeat"})
+            except (OSError, ValueError):
+                return
+
+    def _run_job(self, stream, message, script):
+        job_id = message["job"]
+        job_dir = self.work_dir / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        script_path = job_dir / "script.py"
+        script_path.write_bytes(script)
+        logger.info("Rendering job %s (%s)", job_id, message.get("profile"))
+
+        def forward(line):
+            self._send(stream, {"type": "progress", "job": job_id, "line": line})
+
+        renderer = ManimRenderer(
+            script_path=script_path,
+            scene_name=message.get("scene") or SCENE_NAME,
+            profile=message.get("profile"),
+            media_dir=job_dir / "media",
+            on_output=forward,
+        )
+        try:
+            try:
+                video_path = renderer.render()
+            except Exception as exc:
+                error = (renderer.last_stderr or "").strip() or str(exc)
+                self._send(stream, {"type": "failed", "job": job_id, "error": error})
+                return
+            self._send(stream, {"type": "result", "job": job_id}, payload_path=video_path)
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+
+class DistributedRenderer:
+    def __init__(
+        self,
+        coordinator=RENDER_COORDINATOR,
+        script_path=None,
+        scene_name=SCENE_NAME,
+        profile=None,
+        media_dir="media",
+        on_output=None,
+        secret=COORDINATOR_SECRET,
+    ):
+        if script_path is None:
+            script_path = Path(OUTPUT_DIR) / "script.py"
+        self.address = parse_address(coordinator)
+        self.secret = secret
+        self.script_path = Path(script_path)
+        self.scene_name = scene_name
+        self.profile = profile
+        self.media_dir = Path(media_dir)
+        self.on_output = on_output
+        self.last_stdout = ""
+        self.last_stderr = ""
+        self.last_returncode = None
+
+    def render(self):
+        script = self.script_path.read_bytes()
+        lines = []
+        with socket.create_connection(self.address) as sock:
+            stream = sock.makefile("rwb")
+            send_message(
+                stream,
+                {"type": "submit", "profile": self.profile, "scene": self.scene_name, "secret": self.secret},
+                payload=script,
+            )
+            while True:
+                message = read_message(stream)
+                if message is None:
+                    raise RuntimeError("Render coordinator closed the connection")
+                kind = message.get("type")
+                if kind == "accepted":
+                    logger.info("Coordinator accepted job %s", message["job"])
+                elif kind == "progress":
+                    lines.append(message.get("line", ""))
+                    if self.on_output:
+                        self.on_output(message.get("line", ""))
+                elif kind == "result":
+                    output_dir = self.media_dir / "distributed"
+                    output_dir.mkdir(parents=True, exist_ok=True)
+                    output_path = output_dir / f"{message['job']}.mp4"
+                    read_payload(stream, message["size"], output_path)
+                    self.last_stderr = "\n".join(lines)
+                    self.last_returncode = 0
+                    logger.info("Rendered video at %s", output_path)
+                    return str(output_path)
+                elif kind == "rejected":
+                    raise RuntimeError(f"Render coordinator rejected the job: {message.get('error')}")
+                elif kind == "failed":
+                    self.last_stderr = message.get("error", "")
+                    self.last_returncode = 1
+                    raise RuntimeError(f"Distributed render failed: {message.get('error', 'unknown error')}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed manim rendering.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    coordinator_parser = subparsers.add_parser("coordinator", help="Run the job coordinator")
+    coordinator_parser.add_argument("--address", default=COORDINATOR_ADDRESS)
+    coordinator_parser.add_argument("--result-dir", default=COORDINATOR_RESULT_DIR)
+    coordinator_parser.add_argument("--secret", default=COORDINATOR_SECRET)
+
+    worker_parser = subparsers.add_parser("worker", help="Run a render worker")
+    worker_parser.add_argument("--coordinator", default=COORDINATOR_ADDRESS)
+    worker_parser.add_argument("--name")
+    worker_parser.add_argument("--work-dir")
+    worker_parser.add_argument("--secret", default=COORDINATOR_SECRET)
+
+    submit_parser = subparsers.add_parser("submit", help="Render a script on the workers")
+    submit_parser.add_argument("script")
+    submit_parser.add_argument("--coordinator", default=COORDINATOR_ADDRESS)
+    submit_parser.add_argument("--profile", default=DEFAULT_RENDER_PROFILE)
+    submit_parser.add_argument("--scene", default=SCENE_NAME)
+    submit_parser.add_argument("--secret", default=COORDINATOR_SECRET)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "coordinator":
+        coordinator = RenderCoordinator(args.address, result_dir=args.result_dir, secret=args.secret).start()
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            coordinator.stop()
+    elif args.command == "worker":
+        worker = RenderWorker(args.coordinator, name=args.name, work_dir=args.work_dir, secret=args.secret)
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            worker.stop()
+    else:
+        renderer = DistributedRenderer(
+            args.coordinator,
+            script_path=args.script,
+            scene_name=args.scene,
+            profile=args.profile,
+            on_output=print,
+            secret=args.secret,
+        )
+        print(renderer.render())
+
+
+if __name__ == "__main__":
+    main()
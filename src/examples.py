@@ -0,0 +1,140 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from config import EXAMPLES_INDEX_PATH, EXAMPLES_MAX_CHARS, EXAMPLES_MAX_ENTRIES, EXAMPLES_TOP_K
+
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STEM_LENGTH = 6
+STEM_ENDINGS = "aeiouysаеёиоуыэюяйь"
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return [stem(token) for token in TOKEN_RE.findall((text or "").lower()) if len(token) > 1]
+
+
+def stem(token):
+    # A crude stemmer: a short prefix without trailing vowels folds most
+    # English and Russian inflections ("orbits"/"orbiting", "луна"/"луной")
+    # together without a language-specific dependency.
+    stemmed = token[:STEM_LENGTH].rstrip(STEM_ENDINGS)
+    return stemmed if len(stemmed) > 1 else token
+
+
+class ExampleIndex:
+    def __init__(self, path=EXAMPLES_INDEX_PATH, max_entries=EXAMPLES_MAX_ENTRIES):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = None
+        self._stats = None
+
+    def add(self, prompt, script):
+        prompt = (prompt or "").strip()
+        script = (script or "").strip()
+        if not prompt or not script:
+            return None
+        script_hash = hashlib.sha256(script.encode("utf-8")).hexdigest()
+        with self._lock:
+            entries = [
+                entry
+                for entry in self._load()
+                if entry["script_hash"] != script_hash and entry["prompt"] != prompt
+            ]
+            entry = {
+                "prompt": prompt,
+                "script": script + "\n",
+                "script_hash": script_hash,
+                "created": time.time(),
+            }
+            entries.append(entry)
+            if self.max_entries and len(entries) > self.max_entries:
+                entries = entries[-self.max_entries :]
+            self._write(entries)
+            self._entries = entries
+            self._stats = None
+        logger.info("Saved working script as an example (%d in index)", len(entries))
+        return entry
+
+    def search(self, query, top_k=EXAMPLES_TOP_K):
+        terms = set(tokenize(query))
+        if not terms or not top_k:
+            return []
+        with self._lock:
+            entries = self._load()
+            if not entries:
+                return []
+            documents, frequencies, average_length = self._index(entries)
+
+        count = len(entries)
+        scored = []
+        for position, (entry, counts) in enumerate(zip(entries, documents)):
+            length = sum(counts.values())
+            score = 0.0
+            for term in terms:
+                tf = counts.get(term)
+                if not tf:
+                    continue
+                df = frequencies[term]
+                idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+            if score > 0:
+                # Newer entries win ties, they were written against the current prompt rules.
+                scored.append((score, position, entry))
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [entry for _, _, entry in scored[:top_k]]
+
+    def prompt_section(self, query, top_k=EXAMPLES_TOP_K, max_chars=EXAMPLES_MAX_CHARS):
+        parts = []
+        used = []
+        remaining = max_chars
+        for entry in self.search(query, top_k):
+            block = f"Request: {entry['prompt']}\nScript:\n```python\n{entry['script'].strip()}\n```"
+            if max_chars and len(block) > remaining:
+                continue
+            parts.append(block)
+            used.append(entry)
+            remaining -= len(block)
+        if not parts:
+            return "", []
+        header = "### EXAMPLES OF SCRIPTS THAT RENDERED SUCCESSFULLY FOR SIMILAR REQUESTS:"
+        return "\n\n".join([header] + parts), used
+
+    def _index(self, entries):
+        if self._stats is None:
+            documents = [Counter(tokenize(entry["prompt"])) for entry in entries]
+            frequencies = Counter()
+            for counts in documents:
+                frequencies.update(counts.keys())
+            total = sum(sum(counts.values()) for counts in documents)
+            self._stats = (documents, frequencies, max(1.0, total / len(documents)))
+        return self._stats
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = []
+            if self.path.exists():
+                try:
+                    self._entries = json.loads(self.path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    logger.warning("Example index is unreadable, starting a new one")
+        return self._entries
+
+    def _write(self, entries):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        tmp.write_text(json.dumps(entries, indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
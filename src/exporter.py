@@ -0,0 +1,138 @@
+import argparse
+import logging
+import subprocess
+from pathlib import Path
+
+from config import EXPORT_DEFAULT_FORMATS, EXPORT_SETTINGS
+
+
+logger = logging.getLogger(__name__)
+
+EXPORT_SUFFIXES = {
+    "gif": ".gif",
+    "webm": ".webm",
+    "apng": ".apng",
+    "poster": "_poster.png",
+    "social": "_social.mp4",
+}
+
+
+def export_targets(output_base, formats):
+    output_base = Path(output_base)
+    if output_base.suffix.lower() in (".mp4", ".gif", ".webm", ".apng", ".png"):
+        output_base = output_base.with_suffix("")
+    return {fmt: output_base.with_name(output_base.name + EXPORT_SUFFIXES[fmt]) for fmt in formats}
+
+
+def build_export_command(source_path, targets, settings=None):
+    settings = EXPORT_SETTINGS if settings is None else settings
+    formats = list(targets)
+    labels = [f"[s{index}]" for index in range(len(formats))]
+    filters = [f"[0:v]split={len(formats)}{''.join(labels)}"]
+    outputs = []
+
+    for fmt, label in zip(formats, labels):
+        options = settings.get(fmt, {})
+        target = str(targets[fmt])
+        if fmt == "gif":
+            filters.append(
+                f"{label}fps={options.get('fps', 15)},"
+                f"scale={options.get('width', 640)}:-1:flags=lanczos,split[gif_a][gif_b]"
+            )
+            filters.append("[gif_a]palettegen=stats_mode=diff[gif_palette]")
+            filters.append("[gif_b][gif_palette]paletteuse=dither=bayer[gif]")
+            outputs += ["-map", "[gif]", "-loop", "0", target]
+        elif fmt == "webm":
+            outputs += [
+                "-map",
+                label,
+                "-c:v",
+                "libvpx-vp9",
+                "-crf",
+                str(options.get("crf", 32)),
+                "-b:v",
+                "0",
+                "-deadline",
+                "good",
+                "-cpu-used",
+                str(options.get("cpu_used", 4)),
+                "-row-mt",
+                "1",
+                "-an",
+                target,
+            ]
+        elif fmt == "apng":
+            filters.append(
+                f"{label}fps={options.get('fps', 15)},"
+                f"scale={options.get('width', 480)}:-1:flags=lanczos[apng]"
+            )
+            outputs += ["-map", "[apng]", "-f", "apng", "-plays", "0", target]
+        elif fmt == "poster":
+            filters.append(f"{label}trim=start={options.get('time', 0.0)},setpts=PTS-STARTPTS[poster]")
+            outputs += ["-map", "[poster]", "-frames:v", "1", "-update", "1", target]
+        elif fmt == "social":
+            filters.append(f"{label}scale=-2:{options.get('height', 720)}:flags=lanczos[social]")
+            outputs += [
+                "-map",
+                "[social]",
+                "-c:v",
+                "libx264",
+                "-preset",
+                str(options.get("preset", "medium")),
+                "-crf",
+                str(options.get("crf", 23)),
+                "-pix_fmt",
+                "yuv420p",
+                "-movflags",
+                "+faststart",
+                "-an",
+                target,
+            ]
+        else:
+            raise ValueError(f"Unknown export format: {fmt}")
+
+    return ["ffmpeg", "-y", "-i", str(source_path), "-filter_complex", ";".join(filters)] + outputs
+
+
+def export_video(source_path, output_base, formats=None, settings=None):
+    formats = list(EXPORT_DEFAULT_FORMATS if formats is None else formats)
+    unknown = [fmt for fmt in formats if fmt not in EXPORT_SUFFIXES]
+    if unknown:
+        raise ValueError(f"Unknown export formats: {', '.join(unknown)}")
+    if not formats:
+        return {}
+
+    targets = export_targets(output_base, formats)
+    for target in targets.values():
+        target.parent.mkdir(parents=True, exist_ok=True)
+    cmd = build_export_command(source_path, targets, settings)
+    logger.info("Exporting %s: %s", ", ".join(formats), " ".join(cmd))
+    result = subprocess.run(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg export failed: {result.stderr.strip() or 'unknown error'}")
+    return {fmt: str(path) for fmt, path in targets.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a video to several formats in one ffmpeg pass.")
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--formats", default=",".join(EXPORT_DEFAULT_FORMATS))
+    parser.add_argument("--output-dir")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    formats = [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()]
+    for video in args.videos:
+        video = Path(video)
+        base = Path(args.output_dir) / video.stem if args.output_dir else video.with_suffix("")
+        for fmt, path in export_video(video, base, formats).items():
+            print(f"{fmt}: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ import subprocess
 from pathlib import Path
 
 from config import LLM_COMMAND, OUTPUT_DIR
+from src.examples import ExampleIndex
+from src.optimizer import ScriptOptimizer
 
 try:
     from config import SYSTEM_PROMPT
@@ -15,13 +17,26 @@ logger = logging.getLogger(__name__)
 
 
 class CodeGenerator:
-    def __init__(self, command=LLM_COMMAND, output_dir=OUTPUT_DIR, system_prompt=None):
+    def __init__(
+        self,
+        command=LLM_COMMAND,
+        output_dir=OUTPUT_DIR,
+        system_prompt=None,
+        optimizer=None,
+        examples=None,
+    ):
         self.command = list(command)
         self.output_dir = Path(output_dir)
         self.system_prompt = SYSTEM_PROMPT if system_prompt is None else system_prompt
-
-    def generate(self, prompt):
-        full_prompt = self._build_prompt(prompt)
+        self.optimizer = ScriptOptimizer() if optimizer is None else optimizer
+        self.last_optimizations = []
+        self.examples = ExampleIndex() if examples is None else examples
+        self.last_examples = []
+
+    def generate(self, prompt, query=None):
+        # ``query`` is the text used to look up examples; fix and simplify
+        # prompts pass the user's original request here.
+        full_prompt = self._build_prompt(prompt, prompt if query is None else query)
         cmd, stdin_data = self._build_command(full_prompt)
         logger.info("Running LLM command: %s", " ".join(cmd))
 
@@ -56,6 +71,7 @@ class CodeGenerator:
         cleaned = self._clean_response(stdout)
         if not cleaned.strip():
             raise RuntimeError("LLM returned empty script")
+        cleaned = self._optimize(cleaned)
 
         self.output_dir.mkdir(parents=True, exist_ok=True)
         script_path = self.output_dir / "script.py"
@@ -63,10 +79,75 @@ class CodeGenerator:
         logger.info("Wrote script to %s", script_path)
         return str(script_path)
 
-    def _build_prompt(self, prompt):
+    def refine(self, previous_script, change_request):
+        # The previous script already shows the model what works.
+        return self.generate(self._build_refine_prompt(previous_script, change_request), query="")
+
+    def fix(self, prompt, error, script_path):
+        return self.generate(self._build_fix_prompt(prompt, error, script_path), query=prompt)
+
+    def remember_success(self, prompt, script_path):
+        if not self.examples:
+            return
+        try:
+            self.examples.add(prompt, Path(script_path).read_text(encoding="utf-8"))
+        except Exception:
+            logger.exception("Failed to save the script as an example")
+
+    def _build_refine_prompt(self, previous_script, change_request):
+        parts = [
+            "Here is a working Manim script:",
+            (previous_script or "").strip(),
+            f"Change request:\n{(change_request or '').strip()}",
+            (
+                "Apply only the requested change and keep every other line, including the order "
+                "of self.play and self.wait calls, exactly as it is. Output the complete script only."
+            ),
+        ]
+        return "\n\n".join(part for part in parts if part)
+
+    def _build_fix_prompt(self, user_prompt, error, script_path):
+        code = ""
+        if script_path:
+            try:
+                code = Path(script_path).read_text(encoding="utf-8")
+            except Exception:
+                code = ""
+
+        parts = [
+            user_prompt.strip() if user_prompt else "",
+            "The previous Manim code failed to render.",
+            f"Error output:\n{error}".strip(),
+            f"Previous code:\n{code}".strip(),
+            "Fix the code and output the complete corrected script only.",
+        ]
+        return "\n\n".join(part for part in parts if part) + "\n"
+
+    def _optimize(self, text):
+        self.last_optimizations = []
+        if not self.optimizer:
+            return text
+        try:
+            text = self.optimizer.optimize(text)
+        except Exception:
+            logger.exception("Script optimizer failed, keeping the original script")
+            return text
+        self.last_optimizations = list(self.optimizer.reports)
+        return text
+
+    def _build_prompt(self, prompt, query=""):
         parts = []
         if self.system_prompt:
             parts.append(self.system_prompt.strip())
+        self.last_examples = []
+        if self.examples and query:
+            try:
+                section, self.last_examples = self.examples.prompt_section(query)
+            except Exception:
+                logger.exception("Example lookup failed")
+                section = ""
+            if section:
+                parts.append(section)
         if prompt:
             parts.append(prompt.strip())
         if not parts:
@@ -0,0 +1,430 @@
+import ast
+import copy
+import logging
+
+from config import OPTIMIZER_PASSES
+
+
+logger = logging.getLogger(__name__)
+
+UPDATER_CALLS = {"add_updater", "always_redraw"}
+NUMPY_MODULES = {"np", "numpy", "math"}
+PURE_NUMPY_FUNCTIONS = {
+    "array",
+    "cos",
+    "deg2rad",
+    "exp",
+    "log",
+    "radians",
+    "sin",
+    "sqrt",
+    "tan",
+}
+BODY_FIELDS = ("body", "orelse", "finalbody")
+
+
+class ScriptOptimizer:
+    def __init__(self, passes=None):
+        self.passes = dict(OPTIMIZER_PASSES)
+        if passes:
+            self.passes.update(passes)
+        self.reports = []
+
+    def optimize(self, source):
+        self.reports = []
+        try:
+            tree = ast.parse(source)
+        except SyntaxError as exc:
+            logger.warning("Optimizer skipped, script does not parse: %s", exc)
+            return source
+
+        self._assigned = _assigned_names(tree)
+        self._hoisted = 0
+        self._statement_of = _enclosing_statements(tree)
+        self._changed = set()
+        self._replaced = []
+        originals = [(body, list(body)) for body in _statement_lists(tree)]
+        if self.passes.get("static_always_redraw"):
+            self._inline_static_redraws(tree, source)
+        if self.passes.get("hoist_updater_constants"):
+            for body in _function_bodies(tree):
+                self._hoist_updater_constants(body)
+        for body in list(_statement_lists(tree)):
+            if self.passes.get("merge_adds"):
+                self._merge_adds(body)
+            if self.passes.get("collapse_waits") or self.passes.get("merge_waits"):
+                self._collapse_waits(body)
+            if not body:
+                body.append(ast.Pass())
+
+        if not self.reports:
+            return source
+        for report in self.reports:
+            logger.info("Optimizer: %s", report)
+        ast.fix_missing_locations(tree)
+        return _splice(source, originals, self._changed, self._replaced)
+
+    def _touch(self, node):
+        # Marks the statement holding ``node`` as rewritten. Only rewritten
+        # statements and replaced expressions are written back, so the rest of
+        # the script keeps its comments and layout.
+        stmt = self._statement_of.get(id(node))
+        if stmt is not None:
+            self._changed.add(id(stmt))
+
+    def _report(self, name, message, node=None):
+        line = getattr(node, "lineno", None)
+        where = f" (line {line})" if line else ""
+        self.reports.append(f"{name}: {message}{where}")
+
+    def _is_static_name(self, name):
+        if name in self._assigned:
+            return False
+        return name in NUMPY_MODULES or name.isupper()
+
+    def _is_constant(self, node):
+        if isinstance(node, ast.Constant):
+            return isinstance(node.value, (int, float, complex, str))
+        if isinstance(node, ast.Name):
+            return self._is_static_name(node.id)
+        if isinstance(node, ast.Attribute):
+            return (
+                isinstance(node.value, ast.Name)
+                and node.value.id in NUMPY_MODULES
+                and self._is_static_name(node.value.id)
+                and node.attr in ("pi", "e", "tau")
+            )
+        if isinstance(node, ast.UnaryOp):
+            return self._is_constant(node.operand)
+        if isinstance(node, ast.BinOp):
+            return self._is_constant(node.left) and self._is_constant(node.right)
+        if isinstance(node, (ast.Tuple, ast.List)):
+            return all(self._is_constant(elt) for elt in node.elts)
+        if isinstance(node, ast.Call):
+            func = node.func
+            return (
+                isinstance(func, ast.Attribute)
+                and isinstance(func.value, ast.Name)
+                and func.value.id in NUMPY_MODULES
+                and self._is_static_name(func.value.id)
+                and func.attr in PURE_NUMPY_FUNCTIONS
+                and not node.keywords
+                and all(self._is_constant(arg) for arg in node.args)
+            )
+        return False
+
+    def _worth_hoisting(self, node):
+        if isinstance(node, ast.UnaryOp):
+            return not isinstance(node.operand, (ast.Constant, ast.Name))
+        return isinstance(node, (ast.BinOp, ast.Call, ast.List, ast.Tuple))
+
+    def _hoist_updater_constants(self, body):
+        index = 0
+        while index < len(body):
+            stmt = body[index]
+            assignments = []
+            for call in _calls_in_statement(stmt):
+                if _call_name(call) not in UPDATER_CALLS:
+                    continue
+                for arg in call.args:
+                    if isinstance(arg, ast.Lambda):
+                        arg.body = self._hoist_expression(arg.body, assignments, call)
+            body[index:index] = assignments
+            index += len(assignments) + 1
+
+    def _new_name(self):
+        # A refined script has already been through the optimizer, so earlier
+        # _hoisted_N names may be taken.
+        while True:
+            name = f"_hoisted_{self._hoisted}"
+            self._hoisted += 1
+            if name not in self._assigned:
+                self._assigned.add(name)
+                return name
+
+    def _hoist_expression(self, node, assignments, call):
+        if self._is_constant(node) and self._worth_hoisting(node):
+            name = self._new_name()
+            self._replaced.append((node, name))
+            assignments.append(
+                ast.Assign(targets=[ast.Name(id=name, ctx=ast.Store())], value=node, lineno=call.lineno)
+            )
+            self._report(
+                "hoist_updater_constants",
+                f"moved `{ast.unparse(node)}` out of {_call_name(call)}",
+                call,
+            )
+            return ast.Name(id=name, ctx=ast.Load())
+        if isinstance(node, ast.Lambda):
+            return node
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, ast.expr):
+                setattr(node, field, self._hoist_expression(value, assignments, call))
+            elif isinstance(value, list):
+                value[:] = [
+                    self._hoist_expression(item, assignments, call) if isinstance(item, ast.expr) else item
+                    for item in value
+                ]
+        if isinstance(node, ast.Call):
+            for keyword in node.keywords:
+                keyword.value = self._hoist_expression(keyword.value, assignments, call)
+        return node
+
+    def _is_static_content(self, node):
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name):
+                if child.id in self._assigned:
+                    return False
+                if not (child.id[:1].isupper() or child.id in NUMPY_MODULES):
+                    return False
+            elif (
+                isinstance(child, ast.Attribute)
+                and isinstance(child.value, ast.Name)
+                and child.value.id in NUMPY_MODULES
+            ):
+                # np.random.* and friends give a new value on every redraw.
+                if child.attr not in PURE_NUMPY_FUNCTIONS and child.attr not in ("pi", "e", "tau"):
+                    return False
+            elif isinstance(child, (ast.Lambda, ast.NamedExpr, ast.Await, ast.Yield)):
+                return False
+        return True
+
+    def _inline_static_redraws(self, tree, source):
+        optimizer = self
+
+        class Inliner(ast.NodeTransformer):
+            def visit_Call(self, node):
+                self.generic_visit(node)
+                if (
+                    _call_name(node) == "always_redraw"
+                    and len(node.args) == 1
+                    and not node.keywords
+                    and isinstance(node.args[0], ast.Lambda)
+                    and not node.args[0].args.args
+                    and optimizer._is_static_content(node.args[0].body)
+                ):
+                    body = node.args[0].body
+                    text = ast.get_source_segment(source, body) or ast.unparse(body)
+                    optimizer._replaced.append((node, f"({text})" if "\n" in text else text))
+                    optimizer._report(
+                        "static_always_redraw",
+                        f"replaced always_redraw of static `{ast.unparse(node.args[0].body)}`",
+                        node,
+                    )
+                    return copy.copy(node.args[0].body)
+                return node
+
+        Inliner().visit(tree)
+
+    def _merge_adds(self, body):
+        index = 0
+        while index < len(body) - 1:
+            first = _self_call(body[index], "add")
+            second = _self_call(body[index + 1], "add")
+            if first is not None and second is not None and not first.keywords and not second.keywords:
+                first.args.extend(second.args)
+                self._touch(first)
+                self._report("merge_adds", "merged consecutive self.add calls", body[index + 1])
+                del body[index + 1]
+                continue
+            index += 1
+
+    def _collapse_waits(self, body):
+        index = 0
+        while index < len(body):
+            call = _self_call(body[index], "wait")
+            duration = _wait_duration(call) if call is not None else None
+            if duration == 0 and self.passes.get("collapse_waits"):
+                self._report("collapse_waits", "removed zero-length self.wait()", body[index])
+                del body[index]
+                continue
+            # Merging changes the number of play/wait calls that sharding and
+            # refine index by, so it has its own switch.
+            if duration is not None and self.passes.get("merge_waits") and index + 1 < len(body):
+                next_call = _self_call(body[index + 1], "wait")
+                next_duration = _wait_duration(next_call) if next_call is not None else None
+                if next_duration is not None:
+                    call.args = [ast.Constant(value=duration + next_duration)]
+                    call.keywords = []
+                    self._touch(call)
+                    self._report("merge_waits", "merged consecutive self.wait() calls", body[index + 1])
+                    del body[index + 1]
+                    continue
+            index += 1
+
+
+def _assigned_names(tree):
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+    return names
+
+
+def _enclosing_statements(tree):
+    # ast.walk goes outside in, so nested statements overwrite their parents
+    # and every node maps to the innermost statement around it.
+    owners = {}
+    for stmt in ast.walk(tree):
+        if isinstance(stmt, ast.stmt):
+            for node in ast.walk(stmt):
+                owners[id(node)] = stmt
+    return owners
+
+
+def _splice(source, originals, changed, replaced):
+    # Writes only what the passes changed back into the original text.
+    # Each statement list is compared with its state before the passes, and
+    # removed, rewritten and new statements become separate edits, as does
+    # every replaced expression, so that everything else (comments included)
+    # stays as it was.
+    lines = source.splitlines(keepends=True)
+    starts = [0]
+    for line in lines:
+        starts.append(starts[-1] + len(line))
+    edits = []
+
+    def offset(lineno, col):
+        line = lines[lineno - 1]
+        return starts[lineno - 1] + len(line.encode("utf-8")[:col].decode("utf-8", errors="ignore"))
+
+    def indent_at(position):
+        line = source[source.rfind("\n", 0, position) + 1 :]
+        return line[: len(line) - len(line.lstrip(" \t"))]
+
+    def unparse(stmts, indent):
+        return ("\n" + indent).join(ast.unparse(stmt).replace("\n", "\n" + indent) for stmt in stmts)
+
+    def replace(stmt, added):
+        start = offset(stmt.lineno, stmt.col_offset)
+        end = offset(stmt.end_lineno, stmt.end_col_offset)
+        line_start = source.rfind("\n", 0, start) + 1
+        line_end = source.find("\n", end)
+        line_end = len(source) if line_end < 0 else line_end + 1
+        text = unparse(added, indent_at(start))
+        if not source[line_start:start].strip() and not source[end:line_end].strip():
+            edits.append((line_start, line_end, indent_at(start) + text + "\n" if text else ""))
+        elif text:
+            edits.append((start, end, text))
+        else:
+            # Shares its line with other statements (``a; b``) or a comment;
+            # a semicolon next to it goes too, a comment stays.
+            after = source[end:line_end]
+            if after.lstrip().startswith(";"):
+                end += len(after) - len(after.lstrip()) + 1
+            if ";" in source[line_start:start] and not after.lstrip().startswith(";"):
+                start = source.rindex(";", line_start, start)
+            else:
+                end += len(source[end:line_end]) - len(source[end:line_end].lstrip(" \t"))
+            edits.append((start, end, ""))
+
+    def insert(position, added, before):
+        indent = indent_at(position)
+        text = unparse(added, indent)
+        edits.append((position, position, text + "\n" + indent if before else "\n" + indent + text))
+
+    for body, before in originals:
+        remaining = list(before)
+        added = []
+        previous = None
+        for stmt in body:
+            if not any(stmt is old for old in remaining):
+                added.append(stmt)
+                continue
+            while remaining[0] is not stmt:
+                replace(remaining.pop(0), [])
+            remaining.pop(0)
+            if id(stmt) in changed:
+                replace(stmt, added + [stmt])
+            elif added:
+                insert(offset(stmt.lineno, stmt.col_offset), added, True)
+            added = []
+            previous = stmt
+        for index, stmt in enumerate(remaining):
+            # A list that lost all its statements gets its ``pass`` in place
+            # of the last one.
+            replace(stmt, added if index == len(remaining) - 1 else [])
+        if added and not remaining:
+            insert(offset(previous.end_lineno, previous.end_col_offset), added, False)
+
+    for node, text in replaced:
+        edits.append((offset(node.lineno, node.col_offset), offset(node.end_lineno, node.end_col_offset), text))
+
+    # A rewritten statement already contains the edits made inside it, so
+    # edits that fall within an earlier one are dropped.
+    edits.sort(key=lambda edit: (edit[0], -edit[1]))
+    merged = []
+    for edit in edits:
+        if merged and edit[0] < merged[-1][1]:
+            continue
+        merged.append(edit)
+    for start, end, text in reversed(merged):
+        source = source[:start] + text + source[end:]
+    return source
+
+
+def _statement_lists(tree):
+    for node in ast.walk(tree):
+        for field in BODY_FIELDS:
+            value = getattr(node, field, None)
+            if isinstance(value, list) and value and isinstance(value[0], ast.stmt):
+                yield value
+
+
+def _function_bodies(tree):
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            yield node.body
+
+
+def _calls_in_statement(stmt):
+    stack = [stmt]
+    while stack:
+        node = stack.pop()
+        if node is not stmt and isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        if isinstance(node, ast.Call):
+            yield node
+        stack.extend(ast.iter_child_nodes(node))
+
+
+def _call_name(call):
+    if isinstance(call.func, ast.Name):
+        return call.func.id
+    if isinstance(call.func, ast.Attribute):
+        return call.func.attr
+    return None
+
+
+def _self_call(stmt, method):
+    if not isinstance(stmt, ast.Expr) or not isinstance(stmt.value, ast.Call):
+        return None
+    func = stmt.value.func
+    if (
+        isinstance(func, ast.Attribute)
+        and func.attr == method
+        and isinstance(func.value, ast.Name)
+        and func.value.id == "self"
+    ):
+        return stmt.value
+    return None
+
+
+def _wait_duration(call):
+    if any(keyword.arg != "duration" for keyword in call.keywords):
+        return None
+    values = list(call.args) + [keyword.value for keyword in call.keywords]
+    if not values:
+        return 1.0
+    if len(values) > 1:
+        return None
+    value = values[0]
+    if isinstance(value, ast.Constant) and isinstance(value.value, (int, float)) and not isinstance(value.value, bool):
+        return float(value.value)
+    return None
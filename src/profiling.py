@@ -0,0 +1,175 @@
+import logging
+import pstats
+import shutil
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from config import PROFILING_DIR, PROFILING_SAMPLER, PROFILING_TOP_N
+
+
+logger = logging.getLogger(__name__)
+
+PY_SPY_RATE = 200
+
+
+class RenderProfiler:
+    def __init__(self, output_dir=PROFILING_DIR, sampler=PROFILING_SAMPLER, top_n=PROFILING_TOP_N):
+        self.output_dir = Path(output_dir)
+        self.sampler = resolve_sampler(sampler)
+        self.top_n = top_n
+        self.profile_path = None
+        self.collapsed_path = None
+
+    def wrap(self, cmd, name="render"):
+        # Run manim as a module of the current interpreter, so the profiler
+        # sees the scene code and not just a console-script shim.
+        if cmd and Path(cmd[0]).stem == "manim":
+            cmd = [sys.executable, "-m", "manim"] + list(cmd[1:])
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{time.strftime('%Y%m%d-%H%M%S')}_{name}_{uuid.uuid4().hex[:6]}"
+        self.collapsed_path = self.output_dir / f"{stem}.collapsed.txt"
+        if self.sampler == "py-spy":
+            self.profile_path = None
+            return [
+                "py-spy",
+                "record",
+                "--format",
+                "raw",
+                "--rate",
+                str(PY_SPY_RATE),
+                "--output",
+                str(self.collapsed_path),
+                "--",
+            ] + cmd
+        self.profile_path = self.output_dir / f"{stem}.prof"
+        return [cmd[0], "-m", "cProfile", "-o", str(self.profile_path)] + cmd[1:]
+
+    def collect(self):
+        hotspots = []
+        if self.profile_path is not None:
+            if not self.profile_path.exists():
+                logger.warning("No profile was written to %s", self.profile_path)
+                return None
+            stats = pstats.Stats(str(self.profile_path)).stats
+            write_collapsed(collapse_profile(stats), self.collapsed_path)
+            hotspots = profile_hotspots(stats, self.top_n)
+        elif self.collapsed_path is not None and self.collapsed_path.exists():
+            hotspots = collapsed_hotspots(self.collapsed_path, self.top_n, 1.0 / PY_SPY_RATE)
+        else:
+            logger.warning("No profile was written to %s", self.collapsed_path)
+            return None
+
+        logger.info("Profile saved to %s", self.profile_path or self.collapsed_path)
+        for line in format_hotspots(hotspots):
+            logger.info("  %s", line)
+        return {
+            "profile": str(self.profile_path) if self.profile_path else None,
+            "collapsed": str(self.collapsed_path),
+            "hotspots": hotspots,
+        }
+
+
+def resolve_sampler(sampler):
+    if sampler == "auto":
+        return "py-spy" if shutil.which("py-spy") else "cprofile"
+    if sampler == "py-spy" and not shutil.which("py-spy"):
+        logger.warning("py-spy is not installed, profiling with cProfile instead")
+        return "cprofile"
+    return sampler
+
+
+def function_label(func):
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{Path(filename).name}:{line}({name})"
+
+
+def profile_hotspots(stats, top_n):
+    rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)
+    return [
+        {
+            "function": function_label(func),
+            "self_seconds": round(tt, 4),
+            "total_seconds": round(ct, 4),
+            "calls": nc,
+        }
+        for func, (cc, nc, tt, ct, callers) in rows[:top_n]
+    ]
+
+
+def collapse_profile(stats, max_depth=64, min_fraction=0.0005):
+    # cProfile only records caller/callee edges, not full stacks. Stacks are
+    # rebuilt by walking down from the roots and splitting each function's
+    # time between its callers in proportion to the time spent on each edge.
+    callees = defaultdict(dict)
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge[3]
+    roots = [func for func, value in stats.items() if not value[4]]
+    if not roots and stats:
+        roots = [max(stats, key=lambda func: stats[func][3])]
+    total = sum(stats[func][3] for func in roots) or 1.0
+    min_seconds = total * min_fraction
+    stacks = Counter()
+
+    def walk(func, path, on_path, share):
+        tt = stats[func][2]
+        path = path + [function_label(func)]
+        if tt * share > 0:
+            stacks[";".join(path)] += tt * share
+        if len(path) >= max_depth:
+            return
+        for callee, edge_seconds in callees.get(func, {}).items():
+            callee_total = stats[callee][3]
+            seconds = edge_seconds * share
+            if callee in on_path or callee_total <= 0 or seconds < min_seconds:
+                continue
+            walk(callee, path, on_path | {callee}, min(1.0, seconds / callee_total))
+
+    for root in roots:
+        walk(root, [], {root}, 1.0)
+    return stacks
+
+
+def write_collapsed(stacks, path):
+    # Brendan Gregg's folded format, values in microseconds, readable by
+    # flamegraph.pl, speedscope and inferno.
+    lines = [
+        f"{stack} {int(round(seconds * 1_000_000))}"
+        for stack, seconds in sorted(stacks.items())
+        if seconds * 1_000_000 >= 1
+    ]
+    Path(path).write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def collapsed_hotspots(path, top_n, seconds_per_sample):
+    own = Counter()
+    inclusive = Counter()
+    for line in Path(path).read_text(encoding="utf-8", errors="replace").splitlines():
+        stack, _, count = line.rpartition(" ")
+        if not stack or not count.isdigit():
+            continue
+        frames = stack.split(";")
+        own[frames[-1]] += int(count)
+        for frame in set(frames):
+            inclusive[frame] += int(count)
+    return [
+        {
+            "function": frame,
+            "self_seconds": round(samples * seconds_per_sample, 4),
+            "total_seconds": round(inclusive[frame] * seconds_per_sample, 4),
+            "calls": None,
+        }
+        for frame, samples in own.most_common(top_n)
+    ]
+
+
+def format_hotspots(hotspots):
+    return [
+        f"{spot['self_seconds']:8.3f}s self {spot['total_seconds']:8.3f}s total  {spot['function']}"
+        for spot in hotspots
+    ]
@@ -0,0 +1,53 @@
+import logging
+import os
+import subprocess
+from pathlib import Path
+
+from config import PREVIEW_PROXY_GOP, PREVIEW_PROXY_HEIGHT
+
+
+logger = logging.getLogger(__name__)
+
+
+def make_proxy(source_path, target_path, height=PREVIEW_PROXY_HEIGHT, gop=PREVIEW_PROXY_GOP):
+    target = Path(target_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.stem}.tmp{target.suffix}")
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-i",
+        str(source_path),
+        "-vf",
+        f"scale=-2:'min({int(height)},ih)'",
+        "-c:v",
+        "libx264",
+        "-preset",
+        "veryfast",
+        "-crf",
+        "28",
+        "-g",
+        str(int(gop)),
+        "-keyint_min",
+        str(int(gop)),
+        "-sc_threshold",
+        "0",
+        "-pix_fmt",
+        "yuv420p",
+        "-movflags",
+        "+faststart",
+        "-an",
+        str(tmp),
+    ]
+    logger.info("Creating preview proxy: %s", " ".join(cmd))
+    result = subprocess.run(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        tmp.unlink(missing_ok=True)
+        raise RuntimeError(f"ffmpeg proxy failed: {result.stderr.strip() or 'unknown error'}")
+    os.replace(tmp, target)
+    return str(target)
@@ -1,12 +1,62 @@
 import logging
+import os
+import signal
 import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from config import OUTPUT_DIR, SCENE_NAME
+from config import (
+    DEFAULT_RENDER_PROFILE,
+    OUTPUT_DIR,
+    RENDER_LIMITS,
+    RENDER_PROFILES,
+    RENDER_PROFILING,
+    RENDER_SHARDS,
+    RENDER_STATIC_FRAMES,
+    SCENE_NAME,
+)
+from src.admission import shared_admission
+from src.analyzer import animation_durations, count_animations, estimate_cost
+from src.profiling import RenderProfiler
+from src.static_frames import FRAME_LIMIT_EXIT_CODE, HOLD_FRAMES_ENV, MAX_FRAMES_ENV
+from src.text_cache import shared_text_cache
+
+try:
+    import resource
+except ImportError:
+    resource = None
 
 
 logger = logging.getLogger(__name__)
 
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+LIMIT_SHIM = (
+    "import os, resource, sys\n"
+    "for name, value in zip(('RLIMIT_AS', 'RLIMIT_CPU', 'RLIMIT_FSIZE'), map(int, sys.argv[1:4])):\n"
+    "    limit = getattr(resource, name, None)\n"
+    "    if value <= 0 or limit is None:\n"
+    "        continue\n"
+    "    hard = resource.getrlimit(limit)[1]\n"
+    "    if hard != resource.RLIM_INFINITY:\n"
+    "        value = min(value, hard)\n"
+    "    try:\n"
+    "        resource.setrlimit(limit, (value, value))\n"
+    "    except (OSError, ValueError) as exc:\n"
+    "        print(f'Could not set {name}: {exc}', file=sys.stderr)\n"
+    "os.execvp(sys.argv[4], sys.argv[4:])\n"
+)
+
+QUALITY_SETTINGS = {
+    "-ql": (854, 480, 15),
+    "-qm": (1280, 720, 30),
+    "-qh": (1920, 1080, 60),
+    "-qp": (2560, 1440, 60),
+    "-qk": (3840, 2160, 60),
+}
+
 
 class ManimRenderer:
     def __init__(
@@ -15,49 +65,519 @@ class ManimRenderer:
         scene_name=SCENE_NAME,
         quality_flag="-qm",
         media_dir="media",
+        shards=RENDER_SHARDS,
+        profile=None,
+        text_cache=None,
+        on_output=None,
+        limits=None,
+        admission=None,
+        profiling=RENDER_PROFILING,
+        static_frames=RENDER_STATIC_FRAMES,
     ):
         if script_path is None:
             script_path = Path(OUTPUT_DIR) / "script.py"
         self.script_path = Path(script_path)
         self.scene_name = scene_name
-        self.quality_flag = quality_flag
+        self.profile = resolve_profile(profile, quality_flag)
+        self.quality_flag = self.profile["quality"]
         self.media_dir = Path(media_dir)
+        self.shards = max(1, int(shards or 1))
+        self.text_cache = shared_text_cache() if text_cache is None else text_cache
+        self.on_output = on_output
+        self.limits = dict(RENDER_LIMITS if limits is None else limits)
+        self.admission = shared_admission() if admission is None else admission
+        self.profiler = RenderProfiler() if profiling is True else profiling or None
+        self.last_profile = None
+        # The src.static_frames launcher hooks the Cairo renderer; it holds
+        # unchanged frames and enforces max_frames while the scene runs.
+        cairo = self.profile.get("renderer", "cairo") == "cairo"
+        self.static_frames = bool(static_frames) and cairo
+        self.frame_guard = cairo and bool(self.limits.get("max_frames"))
+        self._processes = set()
+        self._process_lock = threading.Lock()
+        self._cancelled = threading.Event()
         self.last_stdout = ""
         self.last_stderr = ""
         self.last_returncode = None
+        self.last_partial_files = []
 
     def render(self):
-        cmd = ["manim", self.quality_flag, str(self.script_path), self.scene_name]
+        self._check_frame_limit()
+        if self.text_cache:
+            self.text_cache.prune()
+        ranges = self._plan_shards()
+        with self.admission.slot(max(1, len(ranges))):
+            return self._render(ranges)
+
+    def render_tail(self, start, prefix_files):
+        self._check_frame_limit()
+        if self.text_cache:
+            self.text_cache.prune()
+        with self.admission.slot(1):
+            return self._render_tail(start, prefix_files)
+
+    def _render(self, ranges):
+        if len(ranges) > 1:
+            output_path = self._render_sharded(ranges)
+        else:
+            self._run(self._build_command(self.media_dir))
+            output_path = self._find_output()
+            self.last_partial_files = partial_movie_files(self.media_dir, self.script_path.stem, self.scene_name)
+        return self._finish(output_path)
+
+    def _render_tail(self, start, prefix_files):
+        # Re-render only animations from ``start`` on and reuse the partial
+        # movie files of an earlier render for the unchanged head.
+        try:
+            total = count_animations(self.script_path.read_text(encoding="utf-8"), self.scene_name)
+        except OSError:
+            total = None
+        prefix_files = [str(path) for path in prefix_files[:start]]
+        if (
+            start <= 0
+            or total is None
+            or len(prefix_files) < min(start, total)
+            or not all(Path(path).exists() for path in prefix_files)
+        ):
+            logger.info("Partial reuse not possible, rendering the whole scene")
+            return self._render([])
+
+        reason = self._skipped_state_reason(self.script_path.read_text(encoding="utf-8"))
+        if reason:
+            logger.info("Partial reuse not possible, rendering the whole scene: %s", reason)
+            return self._render([])
+
+        start = min(start, total)
+        tail_files = []
+        if start < total:
+            logger.info("Reusing %d of %d animations, rendering the rest", start, total)
+            self._run(self._build_command(self.media_dir, (start, total - 1)))
+            tail_files = partial_movie_files(self.media_dir, self.script_path.stem, self.scene_name)
+            if len(tail_files) != total - start:
+                logger.warning("Unexpected partial movie files after refine, rendering the whole scene")
+                return self._render([])
+        else:
+            logger.info("All %d animations unchanged, reusing the previous render", total)
+
+        self.last_partial_files = prefix_files[:start] + tail_files
+        output_path = self.media_dir / "videos" / self.script_path.stem / "refined" / f"{self.scene_name}.mp4"
+        concat_videos(self.last_partial_files, output_path)
+        return self._finish(str(output_path))
+
+    def cancel(self):
+        self._cancelled.set()
+        with self._process_lock:
+            processes = list(self._processes)
+        for process in processes:
+            try:
+                if os.name == "posix":
+                    os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+            except OSError:
+                pass
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def _check_frame_limit(self):
+        max_frames = self.limits.get("max_frames")
+        if not max_frames:
+            return
+        try:
+            cost = estimate_cost(self.script_path.read_text(encoding="utf-8"), self.scene_name)
+        except OSError:
+            return
+        if cost is None:
+            return
+        frames = cost.frames(profile_geometry(self.profile)[2])
+        if frames > max_frames:
+            self.last_stderr = f"Scene would render about {frames} frames, the limit is {max_frames}."
+            self.last_returncode = None
+            raise RuntimeError(self.last_stderr)
+
+    def _env(self):
+        env = manim_env()
+        env[HOLD_FRAMES_ENV] = "1" if self.static_frames else "0"
+        if self.frame_guard:
+            env[MAX_FRAMES_ENV] = str(int(self.limits["max_frames"]))
+        return env
+
+    def _limited_command(self, cmd):
+        # rlimits are set by a small interpreter that then execs manim, rather
+        # than in preexec_fn: renders are started from shard, server and watch
+        # threads, and running Python between fork and exec is unsafe there.
+        if resource is None:
+            return cmd
+        values = [
+            int((self.limits.get(key) or 0) * scale)
+            for key, scale in (
+                ("memory_mb", 1024 * 1024),
+                ("cpu_seconds", 1),
+                ("file_size_mb", 1024 * 1024),
+            )
+        ]
+        if not any(values):
+            return cmd
+        return [sys.executable, "-c", LIMIT_SHIM] + [str(value) for value in values] + list(cmd)
+
+    def _finish(self, output_path):
+        encode = self.profile.get("encode")
+        if encode:
+            output_path = encode_video(output_path, encode)
+        logger.info("Rendered video at %s", output_path)
+        return output_path
+
+    def _build_command(self, media_dir, animation_range=None):
+        cmd = ["manim"]
+        if self.static_frames or self.frame_guard:
+            cmd = [sys.executable, "-m", "src.static_frames"]
+        cmd += [self.quality_flag, str(self.script_path), self.scene_name]
+        if animation_range is not None:
+            cmd += ["-n", f"{animation_range[0]},{animation_range[1]}"]
+        if self.profile.get("fps"):
+            cmd += ["--fps", str(self.profile["fps"])]
+        if self.profile.get("resolution"):
+            cmd += ["-r", str(self.profile["resolution"])]
+        if self.profile.get("renderer"):
+            cmd += ["--renderer", self.profile["renderer"]]
+            if self.profile["renderer"] == "opengl":
+                cmd.append("--write_to_movie")
+        if self.text_cache:
+            cmd += ["--config_file", str(self.text_cache.config_file())]
+        cmd += ["--media_dir", str(media_dir)]
+        return cmd
+
+    def _run(self, cmd):
+        return self._check_result(*self._execute(cmd))
+
+    def _execute(self, cmd):
+        # Runs one manim process and hands its output back instead of storing
+        # it, so that shard threads don't overwrite each other's results.
+        if self.profiler:
+            cmd = self.profiler.wrap(cmd, self.scene_name)
+        cmd = self._limited_command(cmd)
         logger.info("Running manim: %s", " ".join(cmd))
+        with self._process_lock:
+            if self.cancelled:
+                raise RuntimeError("Render cancelled")
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                errors="replace",
+                env=self._env(),
+                # A process group of its own lets cancel() stop manim's ffmpeg too.
+                start_new_session=os.name == "posix",
+            )
+            self._processes.add(process)
+        try:
+            stdout_parts = []
+            reader = threading.Thread(target=lambda: stdout_parts.append(process.stdout.read()), daemon=True)
+            reader.start()
+            stderr_lines = []
+            for line in process.stderr:
+                stderr_lines.append(line)
+                if self.on_output:
+                    self.on_output(line.rstrip("\n"))
+            returncode = process.wait()
+            reader.join()
+        finally:
+            with self._process_lock:
+                self._processes.discard(process)
+        return returncode, "".join(stdout_parts), "".join(stderr_lines)
 
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-        self.last_stdout = result.stdout or ""
-        self.last_stderr = result.stderr or ""
-        self.last_returncode = result.returncode
+    def _check_result(self, returncode, stdout, stderr):
+        if self.cancelled:
+            self.last_returncode = returncode
+            raise RuntimeError("Render cancelled")
+        if self.profiler:
+            self._collect_profile()
+
+        self.last_stdout = stdout
+        self.last_stderr = stderr
+        self.last_returncode = returncode
         if self.last_stdout:
-            logger.debug("manim stdout:\n%s", result.stdout)
+            logger.debug("manim stdout:\n%s", self.last_stdout)
         if self.last_stderr:
-            logger.debug("manim stderr:\n%s", result.stderr)
-        if result.returncode != 0:
-            raise RuntimeError(f"manim failed with exit code {result.returncode}")
+            logger.debug("manim stderr:\n%s", self.last_stderr)
+        if returncode != 0:
+            reason = describe_limit_exit(returncode, self.limits)
+            if reason:
+                self.last_stderr = f"{self.last_stderr}\n{reason}".strip()
+                raise RuntimeError(f"manim stopped: {reason}")
+            raise RuntimeError(f"manim failed with exit code {returncode}")
+        return returncode
 
-        output_path = self._find_output()
-        logger.info("Rendered video at %s", output_path)
-        return output_path
+    def _collect_profile(self):
+        try:
+            self.last_profile = self.profiler.collect()
+        except Exception:
+            logger.exception("Failed to read the render profile")
+            self.last_profile = None
+
+    def _plan_shards(self):
+        if self.shards <= 1:
+            return []
+        if self.profiler:
+            # One process gives one profile that covers the whole scene.
+            logger.info("Sharding skipped: profiling is on")
+            return []
+        try:
+            source = self.script_path.read_text(encoding="utf-8")
+        except OSError:
+            return []
+        durations = animation_durations(source, self.scene_name)
+        if not durations or len(durations) < 2:
+            logger.info("Sharding skipped: animation sequence is not static")
+            return []
+        reason = self._skipped_state_reason(source)
+        if reason:
+            logger.info("Sharding skipped: %s", reason)
+            return []
+        # Each shard is its own manim process, so never plan more of them than
+        # admission control would let run at once.
+        shards = min(self.shards, self.admission.capacity)
+        if shards < self.shards:
+            logger.info("Limiting %d shards to the %d admission slots", self.shards, shards)
+        if shards <= 1:
+            return []
+        return split_animations(durations, shards)
+
+    def _skipped_state_reason(self, source):
+        # manim -n fast-forwards the animations before ``start``: updaters see
+        # one step of the whole run_time and TracedPath records no points, so
+        # a range that starts mid-scene only matches a full render when the
+        # scene keeps no per-frame state.
+        cost = estimate_cost(source, self.scene_name)
+        if cost is None:
+            return "scene could not be analysed"
+        if cost.updaters or cost.traced_paths:
+            return (
+                f"scene has {cost.updaters} updater(s) and {cost.traced_paths} TracedPath(s), "
+                "which skipped animations do not replay frame by frame"
+            )
+        return None
+
+    def _render_sharded(self, ranges):
+        logger.info("Rendering %d shards: %s", len(ranges), ranges)
+        shard_root = self.media_dir / "shards" / self.script_path.stem
+        with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+            futures = [
+                pool.submit(self._render_shard, shard_root / str(index), animation_range)
+                for index, animation_range in enumerate(ranges)
+            ]
+            results = [future.result() for future in futures]
+
+        # Report the first failing shard with its own output rather than
+        # whichever shard happened to finish last.
+        failed = [(index, result) for index, result in enumerate(results) if result[1] != 0]
+        if failed:
+            index, (_, returncode, stdout, stderr) = failed[0]
+            logger.error("Shard %d of %d (animations %s) failed", index + 1, len(ranges), ranges[index])
+            self._check_result(returncode, stdout, stderr)
+        self._check_result(
+            0,
+            "".join(result[2] for result in results),
+            "".join(result[3] for result in results),
+        )
+        outputs = [result[0] for result in results]
+
+        self.last_partial_files = []
+        for index in range(len(ranges)):
+            self.last_partial_files += partial_movie_files(
+                shard_root / str(index), self.script_path.stem, self.scene_name
+            )
+
+        output_path = self.media_dir / "videos" / self.script_path.stem / "sharded" / f"{self.scene_name}.mp4"
+        concat_videos(outputs, output_path)
+        return str(output_path)
+
+    def _render_shard(self, media_dir, animation_range):
+        returncode, stdout, stderr = self._execute(self._build_command(media_dir, animation_range))
+        video = find_video(media_dir, self.scene_name) if returncode == 0 else None
+        return video, returncode, stdout, stderr
 
     def _find_output(self):
-        if not self.media_dir.exists():
-            raise FileNotFoundError("Media directory not found")
+        return find_video(self.media_dir, self.scene_name)
+
+
+def manim_env():
+    # Generated scripts import helpers from src.utils, so the project root
+    # has to be importable from the manim process.
+    env = dict(os.environ)
+    paths = [str(PROJECT_ROOT)]
+    if env.get("PYTHONPATH"):
+        paths.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(paths)
+    return env
+
+
+def describe_limit_exit(returncode, limits):
+    if returncode == FRAME_LIMIT_EXIT_CODE:
+        return f"frame limit of {limits.get('max_frames')} frames exceeded"
+    signals = {
+        -24: ("cpu_seconds", "CPU time limit of {value}s exceeded"),
+        -25: ("file_size_mb", "output file size limit of {value} MB exceeded"),
+    }
+    if returncode in signals:
+        key, message = signals[returncode]
+        return message.format(value=limits.get(key))
+    if returncode in (-9, 137) and limits.get("memory_mb"):
+        return f"killed, possibly by the {limits['memory_mb']} MB memory limit"
+    return None
+
+
+def profile_geometry(profile):
+    settings = resolve_profile(profile)
+    width, height, fps = QUALITY_SETTINGS.get(settings["quality"], QUALITY_SETTINGS["-qm"])
+    if settings.get("resolution"):
+        try:
+            width, height = (int(part) for part in str(settings["resolution"]).split(","))
+        except ValueError:
+            logger.warning("Invalid resolution in profile: %s", settings["resolution"])
+    if settings.get("fps"):
+        fps = float(settings["fps"])
+    return width, height, fps
+
+
+def resolve_profile(profile=None, quality_flag="-qm"):
+    if profile is None:
+        return {"quality": quality_flag}
+    if isinstance(profile, dict):
+        settings = dict(profile)
+    else:
+        if profile not in RENDER_PROFILES:
+            logger.warning("Unknown render profile %s, using %s", profile, DEFAULT_RENDER_PROFILE)
+            profile = DEFAULT_RENDER_PROFILE
+        settings = dict(RENDER_PROFILES.get(profile, {}))
+        settings["name"] = profile
+    settings.setdefault("quality", quality_flag)
+    return settings
+
+
+def find_video(media_dir, scene_name):
+    media_dir = Path(media_dir)
+    if not media_dir.exists():
+        raise FileNotFoundError("Media directory not found")
+
+    pattern = f"videos/**/{scene_name}.mp4"
+    candidates = list(media_dir.glob(pattern))
+    if not candidates:
+        raise FileNotFoundError("Rendered video not found")
+
+    latest = max(candidates, key=lambda path: path.stat().st_mtime)
+    return str(latest)
+
+
+def partial_movie_files(media_dir, script_stem, scene_name):
+    pattern = f"videos/{script_stem}/*/partial_movie_files/{scene_name}/partial_movie_file_list.txt"
+    lists = list(Path(media_dir).glob(pattern))
+    if not lists:
+        return []
+    latest = max(lists, key=lambda path: path.stat().st_mtime)
+    files = []
+    for line in latest.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line.startswith("file "):
+            continue
+        path = line[len("file "):].strip().strip("'")
+        if path.startswith("file:"):
+            path = path[len("file:"):]
+        files.append(path)
+    return files
+
+
+def split_animations(durations, shards):
+    shards = min(shards, len(durations))
+    total = sum(durations) or float(len(durations))
+    target = total / shards
+    ranges = []
+    start = 0
+    elapsed = 0.0
+    for index, duration in enumerate(durations):
+        elapsed += duration
+        remaining_animations = len(durations) - index - 1
+        remaining_shards = shards - len(ranges) - 1
+        if remaining_shards == 0:
+            break
+        boundary = target * (len(ranges) + 1)
+        if elapsed >= boundary or remaining_animations == remaining_shards:
+            ranges.append((start, index))
+            start = index + 1
+    ranges.append((start, len(durations) - 1))
+    return ranges
+
+
+def concat_videos(paths, output_path):
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    list_path = output_path.with_suffix(".txt")
+    lines = []
+    for path in paths:
+        escaped = Path(path).resolve().as_posix().replace("'", "'\\''")
+        lines.append(f"file '{escaped}'")
+    list_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-f",
+        "concat",
+        "-safe",
+        "0",
+        "-i",
+        str(list_path),
+        "-c",
+        "copy",
+        str(output_path),
+    ]
+    result = subprocess.run(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg concat failed: {result.stderr.strip() or 'unknown error'}")
+    return str(output_path)
 
-        pattern = f"videos/**/{self.scene_name}.mp4"
-        candidates = list(self.media_dir.glob(pattern))
-        if not candidates:
-            raise FileNotFoundError("Rendered video not found")
 
-        latest = max(candidates, key=lambda path: path.stat().st_mtime)
-        return str(latest)
+def encode_video(source_path, encode):
+    source = Path(source_path)
+    output_path = source.with_name(f"{source.stem}.encoded.mp4")
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-i",
+        str(source),
+        "-c:v",
+        str(encode.get("codec", "libx264")),
+        "-preset",
+        str(encode.get("preset", "medium")),
+        "-crf",
+        str(encode.get("crf", 23)),
+    ]
+    if encode.get("tune"):
+        cmd += ["-tune", str(encode["tune"])]
+    cmd += [
+        "-pix_fmt",
+        "yuv420p",
+        "-movflags",
+        "+faststart",
+        "-an",
+        str(output_path),
+    ]
+    logger.info("Encoding with profile settings: %s", " ".join(cmd))
+    result = subprocess.run(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg encode failed: {result.stderr.strip() or 'unknown error'}")
+    return str(output_path)
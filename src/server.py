@@ -0,0 +1,454 @@
+import argparse
+import asyncio
+import json
+import logging
+import mimetypes
+import re
+import shutil
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from config import (
+    DEFAULT_RENDER_PROFILE,
+    MAX_FIX_ATTEMPTS,
+    RENDER_PROFILES,
+    SCENE_NAME,
+    SERVER_ADDRESS,
+    SERVER_EVENT_HISTORY,
+    SERVER_JOBS_DIR,
+    SERVER_MAX_ATTEMPTS,
+    SERVER_MAX_FINISHED_JOBS,
+    SERVER_WORKERS,
+)
+from src.distributed import parse_address
+from src.examples import ExampleIndex
+from src.generator import CodeGenerator
+from src.renderer import ManimRenderer
+from src.store import OutputStore
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+FINISHED = ("done", "failed")
+STATUS_TEXT = {
+    200: "OK",
+    202: "Accepted",
+    206: "Partial Content",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    416: "Range Not Satisfiable",
+}
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Job:
+    def __init__(self, prompt, profile):
+        self.id = uuid.uuid4().hex[:12]
+        self.prompt = prompt
+        self.profile = profile
+        self.status = "queued"
+        self.progress = 0
+        self.error = None
+        self.attempts = 0
+        self.created = time.time()
+        self.finished = None
+        self.artifacts = {}
+        self.events = deque(maxlen=SERVER_EVENT_HISTORY)
+        self.sequence = 0
+        self.subscribers = set()
+
+    def emit(self, kind, **data):
+        self.sequence += 1
+        event = dict(data, type=kind, id=self.sequence)
+        self.events.append(event)
+        for queue in list(self.subscribers):
+            queue.put_nowait(event)
+
+    def set_stage(self, status, progress):
+        self.status = status
+        self.progress = progress
+        self.emit("stage", status=status, progress=progress)
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "prompt": self.prompt,
+            "profile": self.profile,
+            "status": self.status,
+            "progress": self.progress,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+            "artifacts": {name: f"/jobs/{self.id}/artifacts/{name}" for name in self.artifacts},
+            "events": f"/jobs/{self.id}/events",
+        }
+
+
+class JobServer:
+    def __init__(self, address=SERVER_ADDRESS, jobs_dir=SERVER_JOBS_DIR, workers=SERVER_WORKERS, store=None):
+        self.host, self.port = parse_address(address)
+        self.jobs_dir = Path(jobs_dir)
+        self.workers = max(1, int(workers))
+        self.store = OutputStore() if store is None else store
+        self.examples = ExampleIndex()
+        self.jobs = {}
+        self.queue = None
+        self.loop = None
+        self._server = None
+        self._tasks = []
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("Job API listening on http://%s:%d", self.host, self.port)
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def submit(self, prompt, profile):
+        job = Job(prompt, profile)
+        self.jobs[job.id] = job
+        self._evict()
+        job.emit("stage", status=job.status, progress=0, position=self.queue.qsize())
+        self.queue.put_nowait(job)
+        logger.info("Queued job %s (%s)", job.id, profile)
+        return job
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await asyncio.to_thread(self._run_job, job)
+            except Exception as exc:
+                logger.exception("Job %s failed", job.id)
+                self._fail(job, str(exc))
+            finally:
+                self.queue.task_done()
+
+    def _call(self, func, *args, **kwargs):
+        # Job state belongs to the event loop; worker threads hand updates over.
+        self.loop.call_soon_threadsafe(lambda: func(*args, **kwargs))
+
+    def _run_job(self, job):
+        job_dir = self.jobs_dir / job.id
+        generator = CodeGenerator(output_dir=job_dir, examples=self.examples)
+        # MAX_FIX_ATTEMPTS = 0 lets the app retry until the user stops it; an
+        # unattended job needs a bound, so it falls back to SERVER_MAX_ATTEMPTS.
+        max_attempts = MAX_FIX_ATTEMPTS or SERVER_MAX_ATTEMPTS
+        last_error = ""
+        script_path = None
+
+        try:
+            while job.attempts < max_attempts:
+                job.attempts += 1
+                self._call(job.set_stage, "generating", 20)
+                if script_path is None:
+                    script_path = generator.generate(job.prompt)
+                else:
+                    self._call(job.emit, "log", line=f"Fixing the script, attempt {job.attempts - 1}")
+                    script_path = generator.fix(job.prompt, last_error, script_path)
+                for report in generator.last_optimizations:
+                    self._call(job.emit, "log", line=f"Optimizer: {report}")
+
+                self._call(job.set_stage, "rendering", 55)
+                renderer = ManimRenderer(
+                    script_path=script_path,
+                    scene_name=SCENE_NAME,
+                    profile=job.profile,
+                    media_dir=job_dir / "media",
+                    on_output=lambda line: self._call(job.emit, "log", line=line),
+                )
+                try:
+                    video_path = renderer.render()
+                except Exception as exc:
+                    last_error = (renderer.last_stderr or "").strip() or str(exc)
+                    self._call(job.emit, "log", line=last_error, level="error")
+                    continue
+
+                generator.remember_success(job.prompt, script_path)
+                entry = self.store.publish(
+                    video_path,
+                    prompt=job.prompt,
+                    script_path=script_path,
+                    profile=job.profile,
+                    timings={"attempts": job.attempts},
+                )
+                artifacts = {"video": self.store.video_path(entry), "script": Path(script_path)}
+                if renderer.last_profile:
+                    report = renderer.last_profile
+                    artifacts["profile"] = Path(report["profile"] or report["collapsed"])
+                self._call(self._complete, job, artifacts)
+                return
+
+            self._call(self._fail, job, last_error or "Render failed")
+        finally:
+            # The video was moved into the store or the job failed; either way
+            # the manim media tree (partial movies, Tex cache) is no longer needed.
+            shutil.rmtree(job_dir / "media", ignore_errors=True)
+
+    def _complete(self, job, artifacts):
+        job.artifacts = artifacts
+        job.finished = time.time()
+        job.set_stage("done", 100)
+        job.emit("done", artifacts=job.summary()["artifacts"])
+        self._close_subscribers(job)
+
+    def _fail(self, job, error):
+        job.error = error
+        job.finished = time.time()
+        job.set_stage("failed", 0)
+        job.emit("error", error=error)
+        self._close_subscribers(job)
+
+    def _close_subscribers(self, job):
+        for queue in list(job.subscribers):
+            queue.put_nowait(None)
+
+    def _evict(self):
+        finished = sorted(
+            (job for job in self.jobs.values() if job.status in FINISHED),
+            key=lambda job: job.finished,
+        )
+        for job in finished[: max(0, len(finished) - SERVER_MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+
+    async def _handle(self, reader, writer):
+        try:
+            method, path, headers, body = await read_request(reader)
+            await self._route(method, path, headers, body, writer)
+        except HttpError as exc:
+            await send_json(writer, exc.status, {"error": str(exc)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            logger.exception("Request failed")
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _route(self, method, path, headers, body, writer):
+        parts = [unquote(part) for part in urlsplit(path).path.strip("/").split("/") if part]
+        if parts == ["jobs"]:
+            if method == "POST":
+                job = self.submit(*parse_job_request(body))
+                return await send_json(writer, 202, job.summary())
+            if method == "GET":
+                return await send_json(writer, 200, [job.summary() for job in self.jobs.values()])
+            raise HttpError(405, "Use GET or POST")
+
+        if len(parts) < 2 or parts[0] != "jobs" or parts[1] not in self.jobs:
+            raise HttpError(404, "Not found")
+        job = self.jobs[parts[1]]
+        if method not in ("GET", "HEAD"):
+            raise HttpError(405, "Use GET")
+        if len(parts) == 2:
+            return await send_json(writer, 200, job.summary())
+        if parts[2:] == ["events"]:
+            return await self._stream_events(job, headers, writer)
+        if len(parts) == 4 and parts[2] == "artifacts" and parts[3] in job.artifacts:
+            return await send_file(writer, job.artifacts[parts[3]], headers.get("range"), method == "HEAD")
+        raise HttpError(404, "Not found")
+
+    async def _stream_events(self, job, headers, writer):
+        try:
+            last_id = int(headers.get("last-event-id", 0))
+        except ValueError:
+            last_id = 0
+        queue = asyncio.Queue()
+        job.subscribers.add(queue)
+        try:
+            writer.write(
+                response_head(
+                    200,
+                    {"Content-Type": "text/event-stream", "Cache-Control": "no-cache"},
+                )
+            )
+            for event in list(job.events):
+                if event["id"] > last_id:
+                    writer.write(format_event(event))
+                    last_id = event["id"]
+            await writer.drain()
+            if job.status in FINISHED:
+                return
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                if event["id"] > last_id:
+                    writer.write(format_event(event))
+                    await writer.drain()
+        finally:
+            job.subscribers.discard(queue)
+
+
+async def read_request(reader):
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError as exc:
+        raise HttpError(413, "Headers too large") from exc
+    if len(head) > MAX_HEADER_BYTES:
+        raise HttpError(413, "Headers too large")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, path, _ = lines[0].split(" ", 2)
+    except ValueError as exc:
+        raise HttpError(400, "Malformed request line") from exc
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+
+def parse_job_request(body):
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError as exc:
+        raise HttpError(400, "Body must be JSON") from exc
+    if not isinstance(data, dict):
+        raise HttpError(400, "Body must be a JSON object")
+    prompt = str(data.get("prompt") or "").strip()
+    if not prompt:
+        raise HttpError(400, "prompt is required")
+    profile = data.get("profile") or DEFAULT_RENDER_PROFILE
+    if profile not in RENDER_PROFILES:
+        raise HttpError(400, f"Unknown profile {profile!r}, use one of: {', '.join(RENDER_PROFILES)}")
+    return prompt, profile
+
+
+def response_head(status, headers):
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    lines.append("Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def send_json(writer, status, data):
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        response_head(status, {"Content-Type": "application/json; charset=utf-8", "Content-Length": len(body)})
+    )
+    writer.write(body)
+    await writer.drain()
+
+
+def format_event(event):
+    data = json.dumps(event, ensure_ascii=False)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n".encode("utf-8")
+
+
+def parse_range(header, size):
+    match = RANGE_RE.match((header or "").strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if length == 0:
+            raise HttpError(416, "Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or end < start:
+        raise HttpError(416, "Range not satisfiable")
+    return start, end
+
+
+async def send_file(writer, path, range_header=None, head_only=False):
+    path = Path(path)
+    if not path.is_file():
+        raise HttpError(404, "Artifact is missing")
+    size = path.stat().st_size
+    headers = {
+        "Content-Type": mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+        "Accept-Ranges": "bytes",
+    }
+    try:
+        byte_range = parse_range(range_header, size)
+    except HttpError:
+        writer.write(response_head(416, {"Content-Range": f"bytes */{size}", "Content-Length": 0}))
+        await writer.drain()
+        return
+    status = 200
+    start, end = 0, size - 1
+    if byte_range:
+        status = 206
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = max(0, end - start + 1)
+    writer.write(response_head(status, headers))
+    if not head_only:
+        with open(path, "rb") as handle:
+            handle.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = handle.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                writer.write(chunk)
+                remaining -= len(chunk)
+                await writer.drain()
+    await writer.drain()
+
+
+async def serve(address, jobs_dir, workers):
+    server = await JobServer(address, jobs_dir, workers).start()
+    try:
+        await server.serve_forever()
+    finally:
+        await server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local HTTP API for generate-and-render jobs.")
+    parser.add_argument("--address", default=SERVER_ADDRESS)
+    parser.add_argument("--jobs-dir", default=SERVER_JOBS_DIR)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args.address, args.jobs_dir, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import atexit
+import enum
+import hashlib
+import os
+import runpy
+import sys
+
+# numpy comes with manim; it is imported in install() so that the renderer can
+# read the constants below without loading it.
+np = None
+
+# Cameras whose output depends only on the mobjects and the frame settings.
+# ThreeDCamera shades surfaces from its own orientation trackers, so it is
+# rendered as usual.
+SUPPORTED_CAMERAS = ("Camera", "MovingCamera")
+SCALAR_TYPES = (bool, int, float, str, type(None))
+CAMERA_ATTRIBUTES = ("background_color", "background_opacity", "frame_center", "frame_width", "frame_height")
+HOLD_FRAMES_ENV = "MANIM_HOLD_FRAMES"
+MAX_FRAMES_ENV = "MANIM_MAX_FRAMES"
+FRAME_LIMIT_EXIT_CODE = 86
+
+
+def install(hold_frames=True, max_frames=None):
+    # Patch manim's Cairo renderer so that a frame whose drawable state equals
+    # the previous frame's is written again from memory instead of being
+    # rasterized. Scenes with updaters that do not move anything during
+    # self.wait() are the main beneficiaries. The same hook enforces the
+    # frame limit at run time, where loops the static estimate can't count
+    # are visible.
+    global np
+    import numpy as np
+    from manim.renderer.cairo_renderer import CairoRenderer
+
+    original_save_static = CairoRenderer.save_static_frame_data
+    original_add_frame = CairoRenderer.add_frame
+    stats = {"frames": 0, "held": 0, "written": 0}
+
+    def add_frame(self, frame, num_frames=1):
+        if max_frames and not self.skip_animations:
+            stats["written"] += num_frames
+            if stats["written"] > max_frames:
+                print(f"Frame limit of {max_frames} frames exceeded, stopping the render", file=sys.stderr)
+                sys.stderr.flush()
+                os._exit(FRAME_LIMIT_EXIT_CODE)
+        return original_add_frame(self, frame, num_frames)
+
+    def save_static_frame_data(self, scene, static_mobjects):
+        state = _state(self)
+        state["generation"] += 1
+        state["key"] = None
+        return original_save_static(self, scene, static_mobjects)
+
+    def render(self, scene, time, moving_mobjects):
+        if self.skip_animations:
+            self.update_frame(scene, moving_mobjects)
+            self.add_frame(self.get_frame())
+            return
+        state = _state(self)
+        key = frame_key(self, scene, moving_mobjects, state["generation"])
+        stats["frames"] += 1
+        if key is not None and key == state["key"]:
+            stats["held"] += 1
+            self.add_frame(state["frame"])
+            return
+        self.update_frame(scene, moving_mobjects)
+        frame = self.get_frame()
+        state["key"] = key
+        state["frame"] = frame
+        self.add_frame(frame)
+
+    CairoRenderer.add_frame = add_frame
+    if hold_frames:
+        CairoRenderer.save_static_frame_data = save_static_frame_data
+        CairoRenderer.render = render
+        atexit.register(_report, stats)
+    return stats
+
+
+def _state(renderer):
+    state = renderer.__dict__.get("_static_frame_state")
+    if state is None:
+        state = {"generation": 0, "key": None, "frame": None}
+        renderer._static_frame_state = state
+    return state
+
+
+def _report(stats):
+    if stats["frames"]:
+        print(
+            f"Static frames: {stats['held']} of {stats['frames']} frames reused without redrawing",
+            file=sys.stderr,
+        )
+
+
+def frame_key(renderer, scene, moving_mobjects, generation):
+    camera = renderer.camera
+    if type(camera).__name__ not in SUPPORTED_CAMERAS:
+        return None
+    from manim.utils.family import extract_mobject_family_members
+
+    mobjects = moving_mobjects
+    if not mobjects:
+        mobjects = list(scene.mobjects) + [mob for mob in scene.foreground_mobjects if mob not in scene.mobjects]
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(generation).encode())
+    for name in CAMERA_ATTRIBUTES:
+        _update_value(digest, getattr(camera, name, None))
+    frame = getattr(camera, "frame", None)
+    if frame is not None:
+        mobjects = [frame] + list(mobjects)
+    for mob in extract_mobject_family_members(mobjects, only_those_with_points=False):
+        digest.update(f"|{type(mob).__name__}:{id(mob)}".encode())
+        for name, value in sorted(mob.__dict__.items()):
+            if name in ("submobjects", "updaters"):
+                continue
+            digest.update(name.encode())
+            _update_value(digest, value)
+    return digest.digest()
+
+
+def _update_value(digest, value):
+    if isinstance(value, np.ndarray):
+        digest.update(f"{value.dtype.str}{value.shape}".encode())
+        digest.update(np.ascontiguousarray(value).data)
+    elif isinstance(value, SCALAR_TYPES + (enum.Enum,)):
+        digest.update(repr(value).encode())
+    elif isinstance(value, (list, tuple)) and all(isinstance(item, SCALAR_TYPES) for item in value):
+        digest.update(repr(value).encode())
+    elif hasattr(value, "to_hex"):
+        # ManimColor; rgbas already carry the drawn color, this only catches
+        # attributes that are read straight from the color object.
+        digest.update(str(value.to_hex()).encode())
+    else:
+        digest.update(type(value).__name__.encode())
+
+
+def main():
+    install(
+        hold_frames=os.environ.get(HOLD_FRAMES_ENV, "1") != "0",
+        max_frames=int(os.environ.get(MAX_FRAMES_ENV) or 0),
+    )
+    sys.argv[0] = "manim"
+    runpy.run_module("manim", run_name="__main__", alter_sys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from config import OUTPUT_STORE_DIR, OUTPUT_STORE_MAX_ENTRIES
+from src.proxy import make_proxy
+
+
+logger = logging.getLogger(__name__)
+
+FICLONE = 0x40049409
+
+
+class OutputStore:
+    def __init__(self, root=OUTPUT_STORE_DIR, max_entries=OUTPUT_STORE_MAX_ENTRIES):
+        self.root = Path(root)
+        self.max_entries = max_entries
+        self.objects_dir = self.root / "objects"
+        self.proxies_dir = self.root / "proxies"
+        self.scripts_dir = self.root / "scripts"
+        self.index_path = self.root / "index.json"
+        self._lock = threading.Lock()
+
+    def publish(self, video_path, prompt="", script_path=None, profile=None, timings=None):
+        video_path = Path(video_path)
+        digest = file_digest(video_path)
+        target = self.object_path(digest)
+        if target.exists():
+            logger.info("Video %s already stored", digest[:12])
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            move_into_place(video_path, target)
+
+        script_hash = None
+        if script_path:
+            script_hash = self._store_script(Path(script_path))
+
+        entry = {
+            "id": f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}",
+            "created": time.time(),
+            "prompt": prompt or "",
+            "profile": profile,
+            "video": digest,
+            "size": target.stat().st_size,
+            "script": script_hash,
+            "timings": dict(timings or {}),
+        }
+        with self._lock:
+            entries = self._read_index()
+            entries.append(entry)
+            entries = self._evict(entries)
+            self._write_index(entries)
+        logger.info("Published video %s as %s", digest[:12], entry["id"])
+        return entry
+
+    def entries(self):
+        with self._lock:
+            entries = self._read_index()
+        return sorted(entries, key=lambda entry: entry["created"], reverse=True)
+
+    def get(self, entry_id):
+        for entry in self.entries():
+            if entry["id"] == entry_id:
+                return entry
+        return None
+
+    def object_path(self, digest):
+        return self.objects_dir / digest[:2] / f"{digest}.mp4"
+
+    def video_path(self, entry):
+        return self.object_path(entry["video"])
+
+    def proxy_path(self, entry):
+        return self.proxies_dir / entry["video"][:2] / f"{entry['video']}.mp4"
+
+    def ensure_proxy(self, entry):
+        proxy = self.proxy_path(entry)
+        if not proxy.exists():
+            make_proxy(self.video_path(entry), proxy)
+        return proxy
+
+    def script_path(self, entry):
+        if not entry.get("script"):
+            return None
+        return self.scripts_dir / f"{entry['script']}.py"
+
+    def link_latest(self, entry, target):
+        target = Path(target)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex[:8]}.tmp")
+        link_or_copy(self.video_path(entry), tmp, allow_hardlink=True)
+        os.replace(tmp, target)
+        return target
+
+    def export(self, entry_or_path, target):
+        source = self.video_path(entry_or_path) if isinstance(entry_or_path, dict) else Path(entry_or_path)
+        target = Path(target)
+        tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex[:8]}.tmp")
+        link_or_copy(source, tmp, allow_hardlink=False)
+        os.replace(tmp, target)
+        return target
+
+    def _evict(self, entries):
+        if not self.max_entries or len(entries) <= self.max_entries:
+            return entries
+        entries = sorted(entries, key=lambda entry: entry["created"])
+        evicted, kept = entries[: -self.max_entries], entries[-self.max_entries :]
+        referenced = {entry["video"] for entry in kept}
+        referenced_scripts = {entry.get("script") for entry in kept}
+        for entry in evicted:
+            paths = []
+            if entry["video"] not in referenced:
+                referenced.add(entry["video"])
+                paths += [self.video_path(entry), self.proxy_path(entry)]
+            if entry.get("script") and entry["script"] not in referenced_scripts:
+                referenced_scripts.add(entry["script"])
+                paths.append(self.script_path(entry))
+            for path in paths:
+                try:
+                    path.unlink(missing_ok=True)
+                except OSError as exc:
+                    logger.warning("Failed to evict %s: %s", path, exc)
+        logger.info("Evicted %d old entries from the output store", len(evicted))
+        return kept
+
+    def _store_script(self, script_path):
+        try:
+            data = script_path.read_bytes()
+        except OSError:
+            return None
+        digest = hashlib.sha256(data).hexdigest()
+        target = self.scripts_dir / f"{digest}.py"
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(f".{target.name}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, target)
+        return digest
+
+    def _read_index(self):
+        if not self.index_path.exists():
+            return []
+        try:
+            return json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            logger.warning("Output store index is unreadable, starting a new one")
+            return []
+
+    def _write_index(self, entries):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_name(f".{self.index_path.name}.tmp")
+        tmp.write_text(json.dumps(entries, indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def move_into_place(source, target):
+    # The rendered file belongs to this job, so an atomic rename publishes it
+    # without copying; a copy is only needed across filesystems.
+    try:
+        os.replace(source, target)
+        return
+    except OSError:
+        pass
+    tmp = target.with_name(f".{target.name}.tmp")
+    link_or_copy(source, tmp, allow_hardlink=False)
+    os.replace(tmp, target)
+
+
+def link_or_copy(source, target, allow_hardlink=True):
+    source = Path(source)
+    target = Path(target)
+    if allow_hardlink:
+        try:
+            os.link(source, target)
+            return "hardlink"
+        except OSError:
+            pass
+    if reflink(source, target):
+        return "reflink"
+    shutil.copy2(source, target)
+    return "copy"
+
+
+def reflink(source, target):
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        try:
+            os.unlink(target)
+        except OSError:
+            pass
+        return False
+
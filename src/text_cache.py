@@ -0,0 +1,176 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+
+from config import (
+    TEXT_CACHE_DIR,
+    TEXT_CACHE_MAX_MB,
+    TEXT_CACHE_PREWARM_FONT_SIZES,
+    TEXT_CACHE_PREWARM_LABELS,
+)
+
+
+logger = logging.getLogger(__name__)
+
+PREWARM_SCENE = "PrewarmText"
+
+
+class TextCache:
+    def __init__(self, cache_dir=TEXT_CACHE_DIR, max_mb=TEXT_CACHE_MAX_MB):
+        self.cache_dir = Path(cache_dir).resolve()
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+
+    @property
+    def text_dir(self):
+        return self.cache_dir / "texts"
+
+    @property
+    def tex_dir(self):
+        return self.cache_dir / "Tex"
+
+    @property
+    def marker_path(self):
+        return self.cache_dir / ".prewarmed"
+
+    def config_file(self):
+        return self._write_config(self.cache_dir / "manim.cfg", self.text_dir)
+
+    def _write_config(self, path, text_dir):
+        text_dir.mkdir(parents=True, exist_ok=True)
+        self.tex_dir.mkdir(parents=True, exist_ok=True)
+        content = (
+            "[CLI]\n"
+            f"text_dir = {text_dir.as_posix()}\n"
+            f"tex_dir = {self.tex_dir.as_posix()}\n"
+        )
+        with self._lock:
+            if not path.exists() or path.read_text(encoding="utf-8") != content:
+                path.write_text(content, encoding="utf-8")
+        return path
+
+    def size(self):
+        return sum(path.stat().st_size for path in self._files())
+
+    def prune(self):
+        # manim doesn't touch a file on a cache hit, so mtime is only the
+        # write time; the pre-warmed labels are the oldest files and are kept.
+        with self._lock:
+            files = [(path.stat(), path) for path in self._files()]
+            total = sum(stat.st_size for stat, _ in files)
+            if total <= self.max_bytes:
+                return 0
+            protected = {self.text_dir / name for name in self._read_marker().get("files", [])}
+            removed = 0
+            candidates = [item for item in files if item[1] not in protected]
+            for stat, path in sorted(candidates, key=lambda item: item[0].st_mtime):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= stat.st_size
+                removed += 1
+        logger.info("Text cache pruned %d files, %d bytes left", removed, total)
+        return removed
+
+    def prewarm(self, labels=None, font_sizes=None, force=False):
+        # Runs again when the labels change or when any of their files went
+        # missing, e.g. deleted by hand.
+        labels = list(TEXT_CACHE_PREWARM_LABELS if labels is None else labels)
+        font_sizes = list(TEXT_CACHE_PREWARM_FONT_SIZES if font_sizes is None else font_sizes)
+        fingerprint = hashlib.sha256(json.dumps([labels, font_sizes]).encode("utf-8")).hexdigest()
+        marker = self._read_marker()
+        if (
+            not force
+            and marker.get("fingerprint") == fingerprint
+            and all((self.text_dir / name).exists() for name in marker.get("files", []))
+        ):
+            return False
+
+        script_path = self.cache_dir / "prewarm.py"
+        script_path.parent.mkdir(parents=True, exist_ok=True)
+        script_path.write_text(
+            "from manim import *\n"
+            "\n"
+            f"LABELS = {labels!r}\n"
+            f"FONT_SIZES = {font_sizes!r}\n"
+            "\n"
+            f"class {PREWARM_SCENE}(Scene):\n"
+            "    def construct(self):\n"
+            "        for size in FONT_SIZES:\n"
+            "            for label in LABELS:\n"
+            "                Text(label, font_size=size)\n",
+            encoding="utf-8",
+        )
+        # The labels are rendered into an empty directory first, so the files
+        # that belong to them are known and prune() can leave them alone.
+        staging = self.cache_dir / "prewarm_texts"
+        shutil.rmtree(staging, ignore_errors=True)
+        cmd = [
+            "manim",
+            "-ql",
+            "--dry_run",
+            "--config_file",
+            str(self._write_config(self.cache_dir / "prewarm.cfg", staging)),
+            "--media_dir",
+            str(self.cache_dir / "media"),
+            str(script_path),
+            PREWARM_SCENE,
+        ]
+        logger.info("Pre-warming text cache: %s", " ".join(cmd))
+        result = subprocess.run(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        if result.returncode != 0:
+            logger.warning("Text cache pre-warm failed: %s", result.stderr.strip())
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+
+        files = []
+        with self._lock:
+            for path in staging.rglob("*"):
+                if not path.is_file():
+                    continue
+                name = path.relative_to(staging).as_posix()
+                target = self.text_dir / name
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(path, target)
+                files.append(name)
+            self.marker_path.write_text(json.dumps({"fingerprint": fingerprint, "files": files}), encoding="utf-8")
+        shutil.rmtree(staging, ignore_errors=True)
+        logger.info("Text cache pre-warmed with %d files", len(files))
+        return True
+
+    def _read_marker(self):
+        try:
+            marker = json.loads(self.marker_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return marker if isinstance(marker, dict) else {}
+
+    def _files(self):
+        for directory in (self.text_dir, self.tex_dir):
+            if directory.exists():
+                yield from (path for path in directory.rglob("*") if path.is_file())
+
+
+_shared_cache = None
+
+
+def shared_text_cache():
+    global _shared_cache
+    if not TEXT_CACHE_DIR:
+        return None
+    if _shared_cache is None:
+        _shared_cache = TextCache()
+    return _shared_cache
@@ -0,0 +1,77 @@
+import numpy as np
+from manim import ORIGIN, Animation, AnimationGroup, Create, VMobject, linear
+
+
+def _as_point(value):
+    point = np.zeros(3)
+    value = np.asarray(value, dtype=float).reshape(-1)
+    point[: min(3, value.size)] = value[:3]
+    return point
+
+
+def orbit_points(center=ORIGIN, radius=1.0, turns=1.0, phase=0.0, samples=None, clockwise=False):
+    if samples is None:
+        samples = max(2, int(abs(turns) * 360) + 1)
+    angles = phase + np.linspace(0.0, 2 * np.pi * turns, samples)
+    if clockwise:
+        angles = -angles
+    points = np.zeros((samples, 3))
+    points[:, 0] = radius * np.cos(angles)
+    points[:, 1] = radius * np.sin(angles)
+    return points + _as_point(center)
+
+
+def parametric_points(func, t_range=(0.0, 1.0), samples=200):
+    t = np.linspace(t_range[0], t_range[1], samples)
+    values = func(t)
+    if isinstance(values, (tuple, list)):
+        values = np.stack([np.broadcast_to(np.asarray(v, dtype=float), t.shape) for v in values], axis=1)
+    values = np.asarray(values, dtype=float)
+    if values.ndim != 2 or values.shape[0] != samples:
+        raise ValueError("func must map an array of t values to an (N, 2) or (N, 3) array")
+    points = np.zeros((samples, 3))
+    points[:, : min(3, values.shape[1])] = values[:, :3]
+    return points
+
+
+def relative_points(base_points, offset_points):
+    base_points = np.asarray(base_points, dtype=float)
+    offset_points = np.asarray(offset_points, dtype=float)
+    if len(base_points) != len(offset_points):
+        raise ValueError("Point arrays must have the same number of samples")
+    return base_points + offset_points
+
+
+def sample_points(points, alpha):
+    points = np.asarray(points, dtype=float)
+    if len(points) == 1:
+        return points[0]
+    scaled = np.clip(alpha, 0.0, 1.0) * (len(points) - 1)
+    index = min(int(scaled), len(points) - 2)
+    frac = scaled - index
+    return points[index] + (points[index + 1] - points[index]) * frac
+
+
+def trail_from_points(points, **style):
+    trail = VMobject(**style)
+    trail.set_points_as_corners(np.asarray(points, dtype=float))
+    return trail
+
+
+class FollowPoints(Animation):
+    def __init__(self, mobject, points, rate_func=linear, **kwargs):
+        self.path_points = np.asarray(points, dtype=float)
+        super().__init__(mobject, rate_func=rate_func, **kwargs)
+
+    def interpolate_mobject(self, alpha):
+        # Overriding interpolate_mobject skips get_sub_alpha, so apply the
+        # rate function here the way MoveAlongPath does.
+        self.mobject.move_to(sample_points(self.path_points, self.rate_func(alpha)))
+
+
+def follow_with_trail(mobject, points, run_time=1.0, rate_func=linear, **trail_style):
+    trail = trail_from_points(points, **trail_style)
+    return AnimationGroup(
+        FollowPoints(mobject, points, run_time=run_time, rate_func=rate_func),
+        Create(trail, run_time=run_time, rate_func=rate_func),
+    )
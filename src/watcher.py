@@ -0,0 +1,90 @@
+import hashlib
+import logging
+import threading
+import time
+from pathlib import Path
+
+from config import WATCH_DEBOUNCE_SECONDS, WATCH_POLL_SECONDS
+from src.analyzer import find_construct, parse_script
+
+
+logger = logging.getLogger(__name__)
+
+
+class ScriptWatcher:
+    def __init__(self, script_path, on_change, interval=WATCH_POLL_SECONDS, debounce=WATCH_DEBOUNCE_SECONDS):
+        self.script_path = Path(script_path)
+        self.on_change = on_change
+        self.interval = interval
+        self.debounce = debounce
+        self._stop = threading.Event()
+        self._thread = None
+        self._signature = None
+        self._digest = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self.mark_seen()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._poll, daemon=True)
+        self._thread.start()
+        logger.info("Watching %s", self.script_path)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+        self._thread = None
+
+    def mark_seen(self):
+        # Take the current file as already handled, e.g. after the app wrote it.
+        self._signature = self._stat()
+        self._digest = self._read_digest()[1]
+
+    def _stat(self):
+        try:
+            stat = self.script_path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_digest(self):
+        try:
+            source = self.script_path.read_text(encoding="utf-8")
+        except OSError:
+            return None, None
+        return source, hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    def _poll(self):
+        changed_at = None
+        while not self._stop.wait(self.interval):
+            signature = self._stat()
+            if signature != self._signature:
+                # Editors often save in several writes; wait until the file
+                # has been quiet for the debounce period.
+                self._signature = signature
+                changed_at = time.monotonic()
+                continue
+            if changed_at is None or time.monotonic() - changed_at < self.debounce:
+                continue
+            changed_at = None
+            source, digest = self._read_digest()
+            if source is None or digest == self._digest:
+                continue
+            self._digest = digest
+            try:
+                self.on_change(source)
+            except Exception:
+                logger.exception("Watch callback failed")
+
+
+def validate_script(source, scene_name):
+    try:
+        compile(source, "script.py", "exec")
+    except SyntaxError as exc:
+        return f"Syntax error on line {exc.lineno}: {exc.msg}"
+    if find_construct(parse_script(source), scene_name) is None:
+        return f"Scene {scene_name} with a construct method was not found"
+    return None